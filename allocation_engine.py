@@ -0,0 +1,512 @@
+"""成本分摊优化引擎
+
+对基础成本组件再权重（α 车辆、β 人工、γ 设备）寻找推荐分摊系数，不修改原 total_cost；
+含网格、分段并行与连续约束三种求解方式。
+"""
+import heapq
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from cost_engine import parallel_executor, run_tasks
+
+ALLOCATION_COMPONENTS = ['vehicle_cost', 'labor_cost', 'equipment_cost']
+ALLOCATION_WEIGHT_NAMES = ['a', 'b', 'c']
+ALLOCATION_SOLVERS = ['grid', 'stats', 'exact']
+# stats 求解时每块（沿 α 轴切片）目标值网格的元素上限，峰值内存约为其 8 倍字节
+ALLOCATION_SLAB_ELEMENTS = 2 ** 20
+
+def allocation_sufficient_statistics(df: pd.DataFrame):
+    """分摊目标函数的充分统计量：三列成本之和及其在异常记录上的和（共六个数）。
+
+    目标函数对 (α, β, γ) 线性:
+        Σ (α·v + β·l + γ·e)·(1 + p·is_anomaly) = α·(V + p·V_a) + β·(L + p·L_a) + γ·(E + p·E_a)
+    因此只需扫描一遍数据，之后任意权重点、任意惩罚系数的目标值都是 O(1)。
+    各列按 float64 累加，不受紧凑模式下 float32 存储的影响。
+    """
+    components = np.column_stack([df[col].to_numpy(dtype=np.float64) for col in ALLOCATION_COMPONENTS])
+    if 'is_anomaly' in df.columns:
+        anomaly = df['is_anomaly'].to_numpy(dtype=bool)
+        anomaly_totals = components[anomaly].sum(axis=0)
+    else:
+        anomaly_totals = None
+    return {
+        'totals': components.sum(axis=0),
+        'anomaly_totals': anomaly_totals,
+        'n_records': len(df)
+    }
+
+def allocation_objective_coefficients(stats, objective='min_total_cost', anomaly_penalty=0.2):
+    """由充分统计量得到目标函数对 (α, β, γ) 的线性系数"""
+    if objective == 'min_total_cost' or stats['anomaly_totals'] is None:
+        return stats['totals']
+    return stats['totals'] + anomaly_penalty * stats['anomaly_totals']
+
+def exact_allocation_optimum(coefficients, weight_bounds=(0.5, 1.5)):
+    """线性目标在箱约束下的精确最优点：系数为正取下界、为负取上界（为零取下界，与网格搜索一致）"""
+    low, high = weight_bounds
+    return np.where(np.asarray(coefficients) < 0, high, low).astype(float)
+
+class TopKCollector:
+    """有界的前 k 小收集器（堆实现），内存只与 k 有关。
+
+    目标值相同的记录按到达顺序保留先到者，结果与对全量记录做稳定排序后取前 k 一致。
+    """
+
+    def __init__(self, k=50):
+        self.k = int(k)
+        self._heap = []
+        self._count = 0
+
+    def push(self, objective, item):
+        # 堆顶为当前最差的记录（目标值最大、同值时最晚到达）
+        entry = (-objective, -self._count, item)
+        self._count += 1
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def items(self):
+        """按目标值从小到大返回保留的记录"""
+        return [entry[2] for entry in sorted(self._heap, key=lambda entry: (-entry[0], -entry[1]))]
+
+    def to_frame(self):
+        return pd.DataFrame(self.items())
+
+def grid_top_k(objective_grid, weight_range, k=50, a_range=None):
+    """从 (n_a,n,n) 目标值网格中取前 k 个最优点（argpartition，同值按网格顺序），返回 trace DataFrame
+
+    a_range 为网格第一轴对应的 α 取值（按 α 分块计算时为该块的取值），缺省为 weight_range。
+    """
+    a_range = weight_range if a_range is None else a_range
+    flat = objective_grid.ravel()
+    k = min(int(k), flat.size)
+    candidates = np.argpartition(flat, k - 1)[:k] if k < flat.size else np.arange(flat.size)
+    candidates = candidates[np.lexsort((candidates, flat[candidates]))]
+    a_idx, b_idx, c_idx = np.unravel_index(candidates, objective_grid.shape)
+    return pd.DataFrame({
+        'a': a_range[a_idx],
+        'b': weight_range[b_idx],
+        'c': weight_range[c_idx],
+        'objective': flat[candidates].astype(float)
+    })
+
+def optimize_cost_allocation(
+    df: pd.DataFrame,
+    objective: str = 'min_total_cost',
+    anomaly_penalty: float = 0.2,
+    weight_bounds=(0.5, 1.5),
+    step: float = 0.1,
+    solver: str = 'grid',
+    trace_top_k: int = 50,
+    return_trace: bool = False
+):
+    """成本分摊动态优化引擎（不修改原 total_cost，只提供推荐权重）。
+
+    思路:
+        假设可调系数 α(车辆), β(人工), γ(设备)，对基础成本组件进行再权重：
+            new_cost = α*vehicle_cost + β*labor_cost + γ*equipment_cost
+        目标函数:
+            1) min_total_cost: Σ new_cost
+            2) min_cost_with_anomaly_penalty: Σ new_cost * (1 + anomaly_penalty*is_anomaly)
+
+        约束: α,β,γ ∈ [bounds]；最终报告将正规化为占比。
+        求解方式（solver）:
+            grid:  网格搜索，每个网格点重新扫描整表（原实现）
+            stats: 同一网格，但先求六个充分统计量，网格沿 α 轴分块广播求值（每块不超过
+                   ALLOCATION_SLAB_ELEMENTS 个点），与数据量无关、峰值内存不随网格点数增长
+            exact: 由充分统计量直接给出箱约束下的精确最优点（objective_trace 仅含该点）
+        轨迹: objective_trace 只保留前 trace_top_k 个最优网格点（有界堆 / argpartition），
+              细步长（如 0.01，约百万网格点）时内存不随网格点数增长；
+              return_trace=True 时另返回紧凑的 float32 目标值网格 objective_grid（形状 n×n×n，
+              轴依次为 α/β/γ，对应 weight_range）供绘图使用。
+    返回:
+        dict: {baseline_total, best_total, improvement_pct, best_weights_raw, best_weights_normalized, objective_trace(DataFrame)}
+    """
+    if df.empty:
+        return {}
+    if solver not in ALLOCATION_SOLVERS:
+        raise ValueError(f"未知的求解方式: {solver}（可选 {', '.join(ALLOCATION_SOLVERS)}）")
+    low, high = weight_bounds
+    weight_range = np.arange(low, high + 1e-9, step)
+
+    if solver == 'exact':
+        stats = allocation_sufficient_statistics(df)
+        coefficients = allocation_objective_coefficients(stats, objective, anomaly_penalty)
+        weights = exact_allocation_optimum(coefficients, weight_bounds)
+        best = {k: weights[i] for i, k in enumerate(ALLOCATION_WEIGHT_NAMES)}
+        best['objective'] = float(weights @ coefficients)
+        return _allocation_result(stats['totals'].sum(), best, pd.DataFrame([best]), trace_top_k)
+
+    if solver == 'stats':
+        stats = allocation_sufficient_statistics(df)
+        ca, cb, cc = allocation_objective_coefficients(stats, objective, anomaly_penalty)
+        n_weights = len(weight_range)
+        # 沿 α 轴分块求值，每块的前 k 个点按网格顺序并入有界堆：内存只与块大小和 k 有关
+        slab_rows = max(1, ALLOCATION_SLAB_ELEMENTS // (n_weights * n_weights))
+        top_k = TopKCollector(trace_top_k)
+        objective_grid = np.empty((n_weights,) * 3, dtype=np.float32) if return_trace else None
+        for start in range(0, n_weights, slab_rows):
+            a_slab = weight_range[start:start + slab_rows]
+            slab = (
+                ca * a_slab[:, None, None] + cb * weight_range[None, :, None] + cc * weight_range[None, None, :]
+            )
+            for record in grid_top_k(slab, weight_range, trace_top_k, a_range=a_slab).to_dict('records'):
+                top_k.push(record['objective'], record)
+            if objective_grid is not None:
+                objective_grid[start:start + len(a_slab)] = slab
+        trace_df = top_k.to_frame()
+        best = trace_df.iloc[0].to_dict()
+        result = _allocation_result(stats['totals'].sum(), best, trace_df, trace_top_k)
+        if return_trace:
+            result['objective_grid'] = objective_grid
+            result['weight_range'] = weight_range
+        return result
+
+    baseline_total = (df['vehicle_cost'] + df['labor_cost'] + df['equipment_cost']).sum()
+    best = None
+    top_k = TopKCollector(trace_top_k)
+    n_weights = len(weight_range)
+    objective_grid = np.empty((n_weights,) * 3, dtype=np.float32) if return_trace else None
+
+    for i, a in enumerate(weight_range):
+        for j, b in enumerate(weight_range):
+            for k, c in enumerate(weight_range):
+                new_cost_components = a*df['vehicle_cost'] + b*df['labor_cost'] + c*df['equipment_cost']
+                if objective == 'min_total_cost':
+                    obj_val = new_cost_components.sum()
+                else:  # 带异常惩罚
+                    if 'is_anomaly' in df.columns:
+                        obj_val = (new_cost_components * (1 + anomaly_penalty * df['is_anomaly'].astype(int))).sum()
+                    else:
+                        obj_val = new_cost_components.sum()
+                top_k.push(obj_val, {'a': a, 'b': b, 'c': c, 'objective': obj_val})
+                if objective_grid is not None:
+                    objective_grid[i, j, k] = obj_val
+                if best is None or obj_val < best['objective']:
+                    best = {'a': a, 'b': b, 'c': c, 'objective': obj_val}
+
+    result = _allocation_result(baseline_total, best, top_k.to_frame(), trace_top_k)
+    if return_trace:
+        result['objective_grid'] = objective_grid
+        result['weight_range'] = weight_range
+    return result
+
+def _allocation_result(baseline_total, best, trace_df, trace_top_k=50):
+    """组装 optimize_cost_allocation 的统一返回结构"""
+    norm_sum = best['a'] + best['b'] + best['c']
+    normalized = {k: best[k]/norm_sum for k in ['a','b','c']}
+
+    improvement_pct = (baseline_total - best['objective']) / baseline_total * 100 if baseline_total > 0 else 0
+    return {
+        'baseline_total': baseline_total,
+        'best_total': best['objective'],
+        'improvement_pct': improvement_pct,
+        'best_weights_raw': {k: best[k] for k in ['a','b','c']},
+        'best_weights_normalized': normalized,
+        'objective_trace': trace_df.sort_values('objective', kind='stable').head(trace_top_k)  # 前 trace_top_k 最优记录
+    }
+
+# ==================== 分段并行优化 ====================
+
+SEGMENT_ALLOCATION_KEYS = ['business_type', 'region', 'area_type']
+
+# 分段数少于此值时在当前进程内直接求解，不写临时文件、不启动进程池
+SEGMENT_PARALLEL_MIN_SEGMENTS = 8
+
+def segment_cost_frame(columns):
+    """由 (行数, 4) 的成本列块（车辆、人工、设备、异常标记）构造 optimize_cost_allocation 的输入"""
+    return pd.DataFrame({
+        'vehicle_cost': columns[:, 0],
+        'labor_cost': columns[:, 1],
+        'equipment_cost': columns[:, 2],
+        'is_anomaly': columns[:, 3] > 0
+    })
+
+def segment_allocation_task(task):
+    """进程池任务：从只读内存映射的成本列中取出一个分段（连续行区间），独立运行 optimize_cost_allocation"""
+    columns_path, start, end, options = task
+    columns = np.load(columns_path, mmap_mode='r')[start:end]
+    result = optimize_cost_allocation(segment_cost_frame(columns), **options)
+    result.pop('objective_trace', None)
+    return result
+
+def optimize_segment_allocations(
+    df: pd.DataFrame,
+    segment_by=None,
+    objective: str = 'min_total_cost',
+    anomaly_penalty: float = 0.2,
+    weight_bounds=(0.5, 1.5),
+    step: float = 0.1,
+    solver: str = 'stats',
+    workers: int = 1
+):
+    """按分段（默认 业务类型×区域×地区类型）分别运行 optimize_cost_allocation，汇总为权重表。
+
+    数据按分段排序后，成本列与异常标记只写一份到临时 .npy 文件，各进程以只读内存映射方式
+    读取自己负责的连续行区间，任务参数中只传文件路径与行号，不随任务复制数据。
+    workers <= 1 或分段数少于 SEGMENT_PARALLEL_MIN_SEGMENTS 时直接在当前进程内逐段求解。
+
+    返回:
+        DataFrame: 每个分段一行，含分段键、records、a/b/c（原始权重）、a_norm/b_norm/c_norm、
+                   baseline_total、best_total、improvement_pct
+    """
+    segment_by = list(SEGMENT_ALLOCATION_KEYS if segment_by is None else segment_by)
+    segment_by = [col for col in segment_by if col in df.columns]
+    if df.empty or not segment_by:
+        return pd.DataFrame()
+
+    grouper = df.groupby(segment_by, observed=True, sort=True)
+    codes = grouper.ngroup().to_numpy()
+    labels = grouper.size()
+    order = np.argsort(codes, kind='stable')
+    boundaries = np.concatenate([[0], np.cumsum(labels.to_numpy())])
+
+    columns = np.column_stack(
+        [df[col].to_numpy(dtype=np.float64) for col in ALLOCATION_COMPONENTS] +
+        [df['is_anomaly'].to_numpy(dtype=np.float64) if 'is_anomaly' in df.columns else np.zeros(len(df))]
+    )[order]
+    options = {
+        'objective': objective,
+        'anomaly_penalty': anomaly_penalty,
+        'weight_bounds': weight_bounds,
+        'step': step,
+        'solver': solver
+    }
+
+    if workers is None or workers <= 1 or len(labels) < SEGMENT_PARALLEL_MIN_SEGMENTS:
+        results = [
+            optimize_cost_allocation(segment_cost_frame(columns[boundaries[k]:boundaries[k + 1]]), **options)
+            for k in range(len(labels))
+        ]
+    else:
+        with tempfile.TemporaryDirectory(prefix='segment_allocation_') as tmp_dir:
+            columns_path = os.path.join(tmp_dir, 'cost_columns.npy')
+            np.save(columns_path, columns)
+            del columns
+            tasks = [
+                (columns_path, int(boundaries[k]), int(boundaries[k + 1]), options)
+                for k in range(len(labels))
+            ]
+            with parallel_executor(workers) as executor:
+                results = run_tasks(segment_allocation_task, tasks, executor)
+
+    rows = []
+    for result in results:
+        raw = result['best_weights_raw']
+        normalized = result['best_weights_normalized']
+        rows.append({
+            'a': raw['a'], 'b': raw['b'], 'c': raw['c'],
+            'a_norm': normalized['a'], 'b_norm': normalized['b'], 'c_norm': normalized['c'],
+            'baseline_total': result['baseline_total'],
+            'best_total': result['best_total'],
+            'improvement_pct': result['improvement_pct']
+        })
+    table = pd.DataFrame(rows, index=labels.index)
+    table.insert(0, 'records', labels.to_numpy())
+    return table.reset_index()
+
+# ==================== 连续约束优化（分段权重） ====================
+
+def segment_allocation_statistics(df: pd.DataFrame, segment_by=None):
+    """按分段（业务类型 / 区域等）汇总分摊优化所需的充分统计量，只扫描一遍数据。
+
+    返回:
+        dict: labels(分段标签), counts(K), totals(K,3), anomaly_totals(K,3), gram(K,3,3)
+        其中 gram[k] = Σ x xᵀ（x 为三列成本组件），用于方差类目标的解析计算。
+    """
+    components = np.column_stack([df[col].to_numpy(dtype=np.float64) for col in ALLOCATION_COMPONENTS])
+    if segment_by is None:
+        codes = np.zeros(len(df), dtype=int)
+        labels = pd.Index(['全部'])
+    else:
+        grouper = df.groupby(segment_by, observed=True, sort=True)
+        codes = grouper.ngroup().to_numpy()
+        labels = grouper.size().index
+    n_segments = len(labels)
+
+    def segment_sum(values):
+        return np.bincount(codes, weights=values, minlength=n_segments)
+
+    totals = np.column_stack([segment_sum(components[:, i]) for i in range(3)])
+    if 'is_anomaly' in df.columns:
+        anomaly = df['is_anomaly'].to_numpy(dtype=bool)
+        anomaly_totals = np.column_stack([segment_sum(components[:, i] * anomaly) for i in range(3)])
+    else:
+        anomaly_totals = np.zeros_like(totals)
+    gram = np.empty((n_segments, 3, 3))
+    for i in range(3):
+        for j in range(i, 3):
+            gram[:, i, j] = gram[:, j, i] = segment_sum(components[:, i] * components[:, j])
+
+    return {
+        'segment_by': segment_by,
+        'labels': labels,
+        'counts': np.bincount(codes, minlength=n_segments),
+        'totals': totals,
+        'anomaly_totals': anomaly_totals,
+        'gram': gram
+    }
+
+def optimize_cost_allocation_continuous(
+    df: pd.DataFrame | None = None,
+    objective='min_total_cost',
+    anomaly_penalty: float = 0.2,
+    weight_bounds=(0.5, 1.5),
+    weight_sum: float | None = None,
+    segment_by=None,
+    variance_penalty: float = 0.0,
+    stats: dict | None = None
+):
+    """成本分摊系数的连续约束优化（scipy），支持分段权重与非线性目标。
+
+    参数:
+        df: 交易明细；已给出 stats（segment_allocation_statistics 的结果）时可为 None
+        objective: 'min_total_cost' / 'min_cost_with_anomaly_penalty'，
+                   或自定义可调用对象 objective(weights, stats) -> float（weights 形状 (K,3)）
+        weight_bounds: 每个权重的上下界；也可给出 (K,3,2) 数组逐项指定
+        weight_sum: 给定时约束每个分段 α+β+γ = weight_sum（例如 3）
+        segment_by: 分段列名（或列名列表），每个分段一组 (α, β, γ)；None 为全表一组
+        variance_penalty: 方差惩罚系数（无量纲），目标增加 variance_penalty · N·Var(new_cost) / 基准均值
+
+    求解:
+        线性目标（无方差惩罚）走 linprog(HiGHS)；方差惩罚为凸二次目标，走 SLSQP 并给出解析梯度；
+        自定义目标走 SLSQP 数值梯度。所有目标均只用充分统计量计算，求解耗时与数据量无关。
+
+    返回:
+        dict: 与 optimize_cost_allocation 相同的字段（best_weights_raw 为按成本加权的全表平均权重），
+              另含 segment_weights(DataFrame)、success、message。
+    """
+    from scipy.optimize import LinearConstraint, linprog, minimize
+
+    if stats is None:
+        if df is None or df.empty:
+            return {}
+        stats = segment_allocation_statistics(df, segment_by)
+    n_segments = len(stats['labels'])
+    n_records = stats['counts'].sum()
+    totals = stats['totals']
+    baseline_total = totals.sum()
+
+    bounds = np.broadcast_to(np.asarray(weight_bounds, dtype=float), (n_segments, 3, 2)).reshape(-1, 2)
+    if callable(objective):
+        coefficients = None
+    elif objective == 'min_total_cost':
+        coefficients = totals
+    else:
+        coefficients = totals + anomaly_penalty * stats['anomaly_totals']
+
+    equality = None
+    if weight_sum is not None:
+        equality = np.kron(np.eye(n_segments), np.ones((1, 3)))
+
+    if coefficients is not None and variance_penalty <= 0:
+        result = linprog(
+            coefficients.ravel(),
+            A_eq=equality,
+            b_eq=None if equality is None else np.full(n_segments, float(weight_sum)),
+            bounds=bounds,
+            method='highs'
+        )
+        weights = result.x if result.x is not None else bounds.mean(axis=1)
+        success, message = bool(result.success), result.message
+    else:
+        baseline_mean = baseline_total / n_records if n_records else 1.0
+        scale = abs(baseline_total) if baseline_total else 1.0
+
+        def linear_part(w):
+            if coefficients is None:
+                return objective(w.reshape(n_segments, 3), stats), None
+            return float(np.sum(coefficients.ravel() * w)), coefficients.ravel()
+
+        def fun(w):
+            value, grad = linear_part(w)
+            if variance_penalty > 0:
+                weights_k = w.reshape(n_segments, 3)
+                second_moment = np.einsum('ki,kij,kj->', weights_k, stats['gram'], weights_k)
+                mean_cost = np.sum(weights_k * totals) / n_records
+                variance = second_moment / n_records - mean_cost ** 2
+                value += variance_penalty * n_records * variance / baseline_mean
+                if grad is not None:
+                    grad_variance = (
+                        2 * np.einsum('kij,kj->ki', stats['gram'], weights_k) - 2 * mean_cost * totals
+                    ) / baseline_mean
+                    grad = grad + variance_penalty * grad_variance.ravel()
+            # 按基准总成本缩放，避免目标值量级过大影响 SLSQP 收敛判定
+            if grad is not None:
+                return value / scale, grad / scale
+            return value / scale
+
+        start = bounds.mean(axis=1)
+        if weight_sum is not None:
+            start = np.clip(np.full(n_segments * 3, weight_sum / 3), bounds[:, 0], bounds[:, 1])
+
+        # 对角预条件：以 Hessian 对角元的平方根缩放变量 u = d·w，
+        # 各分段成本量级差异很大时 SLSQP 的拟牛顿近似可从数十次迭代降到个位数
+        diag_scale = np.ones(n_segments * 3)
+        if variance_penalty > 0:
+            hessian_diag = (
+                np.diagonal(stats['gram'], axis1=1, axis2=2) - totals ** 2 / n_records
+            ).ravel() * 2 * variance_penalty / baseline_mean / scale
+            # 与目标无关的变量（该分段缺少某项成本）对角元为 0，取极小下限使其在缩放空间中几乎不占步长
+            diag_scale = np.sqrt(np.maximum(hessian_diag, 1e-12))
+
+        def scaled_fun(u):
+            out = fun(u / diag_scale)
+            if isinstance(out, tuple):
+                return out[0], out[1] / diag_scale
+            return out
+
+        constraints = []
+        if equality is not None:
+            constraints = [LinearConstraint(equality / diag_scale, weight_sum, weight_sum)]
+        result = minimize(
+            scaled_fun,
+            start * diag_scale,
+            jac=coefficients is not None,
+            bounds=bounds * diag_scale[:, np.newaxis],
+            constraints=constraints,
+            method='SLSQP'
+        )
+        result.x = result.x / diag_scale
+        weights = result.x
+        success, message = bool(result.success), result.message
+
+    weights_k = weights.reshape(n_segments, 3)
+    if callable(objective):
+        best_objective = float(objective(weights_k, stats))
+    else:
+        best_objective = float(np.sum(coefficients * weights_k))
+    if variance_penalty > 0:
+        mean_cost = np.sum(weights_k * totals) / n_records
+        variance = np.einsum('ki,kij,kj->', weights_k, stats['gram'], weights_k) / n_records - mean_cost ** 2
+        best_objective += variance_penalty * n_records * variance / (baseline_total / n_records)
+
+    # 全表平均权重：按各分段各组件的基准成本加权
+    component_totals = totals.sum(axis=0)
+    overall = np.divide(
+        (weights_k * totals).sum(axis=0), component_totals,
+        out=weights_k.mean(axis=0), where=component_totals > 0
+    )
+    best = {k: overall[i] for i, k in enumerate(ALLOCATION_WEIGHT_NAMES)}
+    best['objective'] = best_objective
+
+    segment_weights = pd.DataFrame(weights_k, columns=ALLOCATION_WEIGHT_NAMES, index=stats['labels'])
+    segment_weights['records'] = stats['counts']
+    segment_weights['baseline_cost'] = totals.sum(axis=1)
+    segment_weights['weighted_cost'] = (weights_k * totals).sum(axis=1)
+
+    trace_df = pd.DataFrame([best])
+    result_dict = _allocation_result(baseline_total, best, trace_df)
+    result_dict.update({
+        'segment_weights': segment_weights,
+        'success': success,
+        'message': message
+    })
+    return result_dict
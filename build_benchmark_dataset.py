@@ -0,0 +1,265 @@
+"""合成基准数据集构建工具（命令行）
+
+按 iter_configurable_business_data 的语义（含冲击场景）逐天生成交易明细，按日期分区写入本地目录:
+
+    <output>/date=YYYY-MM-DD/part-0.parquet     --format parquet（可直接 pd.read_parquet(<output>) 读回）
+    <output>/date=YYYY-MM-DD/<列名>.npy          --format numpy（维度列存类别编码，取值表见 manifest）
+    <output>/_manifest.json                     生成参数、随机熵、异常阈值、列类型与各分区行数
+
+同一 manifest 中的参数与随机熵可以逐行复现整个数据集（与进程数、分块天数无关）。
+
+示例（3 年、约 1 亿条交易）:
+    python build_benchmark_dataset.py --output data/bench --start-date 2021-01-01 --days 1095 \\
+        --total-records 100000000 --seed 20240101 --workers 8
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from cost_engine import (
+    DEFAULT_SHOCK_SCENARIOS,
+    estimate_configurable_anomaly_thresholds,
+    iter_configurable_business_data,
+    resolve_entropy
+)
+
+# 下划线开头的文件会被 parquet 数据集读取端忽略
+MANIFEST_NAME = '_manifest.json'
+MANIFEST_VERSION = 1
+DATASET_FORMATS = ['parquet', 'numpy']
+
+def partition_dir_name(day):
+    """分区目录名（hive 风格，读回时 date 作为分区列还原）"""
+    return f"date={pd.Timestamp(day):%Y-%m-%d}"
+
+def write_parquet_partition(frame, partition_dir):
+    """写入单个日期分区的 parquet 文件，返回相对分区目录的文件名列表"""
+    frame.to_parquet(os.path.join(partition_dir, 'part-0.parquet'), index=False)
+    return ['part-0.parquet']
+
+def write_numpy_partition(frame, partition_dir):
+    """逐列写入 .npy（维度列只存编码），返回相对分区目录的文件名列表"""
+    files = []
+    for col in frame.columns:
+        values = frame[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            array = values.cat.codes.to_numpy()
+        else:
+            array = values.to_numpy()
+        file_name = f"{col}.npy"
+        np.save(os.path.join(partition_dir, file_name), array, allow_pickle=False)
+        files.append(file_name)
+    return files
+
+def read_numpy_partition(partition_dir, manifest, columns=None, mmap_mode='r'):
+    """读回 numpy 格式的单个分区；按 manifest 还原维度列的类别取值"""
+    frame = {}
+    for col in columns or manifest['columns']:
+        array = np.load(os.path.join(partition_dir, f"{col}.npy"), mmap_mode=mmap_mode)
+        if col in manifest['categories']:
+            frame[col] = pd.Categorical.from_codes(array, categories=manifest['categories'][col])
+        else:
+            frame[col] = array
+    return pd.DataFrame(frame)
+
+def load_manifest(output_dir):
+    """读取数据集目录下的 manifest"""
+    with open(os.path.join(output_dir, MANIFEST_NAME), encoding='utf-8') as f:
+        return json.load(f)
+
+def _clear_dataset_dir(output_dir):
+    """仅删除本工具写出的分区目录与 manifest，不动目录中的其他文件"""
+    for name in os.listdir(output_dir):
+        path = os.path.join(output_dir, name)
+        if name.startswith('date=') and os.path.isdir(path):
+            shutil.rmtree(path)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+def build_benchmark_dataset(
+    output_dir: str,
+    start_date: datetime,
+    days: int,
+    records_per_day: int,
+    seed: int | None = None,
+    fmt: str = 'parquet',
+    daily_profile: list | None = None,
+    shock_scenarios: list | None = None,
+    chunk_days: int | None = None,
+    workers: int = 1,
+    overwrite: bool = False,
+    progress=None
+):
+    """生成并落盘按日期分区的基准数据集，返回写出的 manifest（dict）。
+
+    流程:
+        1. 固定随机熵（seed 为 None 时新生成并记入 manifest）；
+        2. 第一遍只做分位数估计得到异常阈值（estimate_configurable_anomaly_thresholds）；
+        3. 第二遍按相同随机流流式生成，每块 chunk_days 天，逐天写分区，内存只与块大小有关。
+    progress: 可选回调 progress(已完成天数, 总天数, 已写行数)。
+    """
+    if fmt not in DATASET_FORMATS:
+        raise ValueError(f"不支持的数据集格式: {fmt}（可选 {', '.join(DATASET_FORMATS)}）")
+    days = max(1, int(days))
+    records_per_day = max(1, int(records_per_day))
+    if chunk_days is None:
+        chunk_days = max(1, int(workers or 1))
+    if shock_scenarios is None:
+        shock_scenarios = DEFAULT_SHOCK_SCENARIOS
+
+    os.makedirs(output_dir, exist_ok=True)
+    if os.path.exists(os.path.join(output_dir, MANIFEST_NAME)):
+        if not overwrite:
+            raise FileExistsError(f"{output_dir} 已存在数据集（如需重建请使用 overwrite）")
+        _clear_dataset_dir(output_dir)
+
+    entropy = resolve_entropy(seed)
+    simulation_kwargs = {
+        'start_date': start_date,
+        'days': days,
+        'daily_profile': daily_profile,
+        'shock_scenarios': shock_scenarios,
+        'seed': entropy,
+        'base_records_per_day': records_per_day,
+        'workers': workers
+    }
+    build_start = time.time()
+    thresholds = estimate_configurable_anomaly_thresholds(**simulation_kwargs)
+
+    writer = write_parquet_partition if fmt == 'parquet' else write_numpy_partition
+    partitions = []
+    columns = None
+    categories = {}
+    total_rows = 0
+    for chunk in iter_configurable_business_data(
+        chunk_days=chunk_days, anomaly_thresholds=thresholds, **simulation_kwargs
+    ):
+        # date 由分区目录表示，不重复写入文件
+        day_keys = chunk.pop('date')
+        for day, frame in chunk.groupby(day_keys.to_numpy(), sort=True):
+            if columns is None:
+                columns = {col: str(dtype) for col, dtype in frame.dtypes.items()}
+                categories = {
+                    col: [str(c) for c in dtype.categories]
+                    for col, dtype in frame.dtypes.items()
+                    if isinstance(dtype, pd.CategoricalDtype)
+                }
+            partition = partition_dir_name(day)
+            partition_dir = os.path.join(output_dir, partition)
+            os.makedirs(partition_dir, exist_ok=True)
+            files = writer(frame.reset_index(drop=True), partition_dir)
+            partitions.append({
+                'date': f"{pd.Timestamp(day):%Y-%m-%d}",
+                'path': partition,
+                'rows': int(len(frame)),
+                'shock_label': str(frame['shock_label'].iloc[0]),
+                'files': files
+            })
+            total_rows += len(frame)
+        if progress is not None:
+            progress(len(partitions), days, total_rows)
+
+    manifest = {
+        'manifest_version': MANIFEST_VERSION,
+        'generator': 'cost_engine.iter_configurable_business_data',
+        'format': fmt,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'build_seconds': round(time.time() - build_start, 3),
+        'parameters': {
+            'start_date': f"{start_date:%Y-%m-%d}",
+            'days': days,
+            'records_per_day': records_per_day,
+            # 128 位熵按字符串保存，避免 JSON 读取端精度丢失
+            'seed_entropy': str(entropy),
+            'daily_profile': None if daily_profile is None else [float(w) for w in daily_profile],
+            'shock_scenarios': shock_scenarios
+        },
+        'anomaly_thresholds': thresholds,
+        'total_rows': int(total_rows),
+        'columns': columns,
+        'categories': categories,
+        'partitions': partitions
+    }
+    # 先写临时文件再替换，manifest 存在即代表数据集完整
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="生成按日期分区的合成交易基准数据集")
+    parser.add_argument('--output', required=True, help="输出目录")
+    parser.add_argument('--start-date', default='2021-01-01', help="起始日期 YYYY-MM-DD（默认 2021-01-01）")
+    parser.add_argument('--days', type=int, default=1095, help="天数（默认 1095，约 3 年）")
+    volume = parser.add_mutually_exclusive_group()
+    volume.add_argument('--records-per-day', type=int, help="每日记录数")
+    volume.add_argument('--total-records', type=int, help="总记录数（按天数均分并向上取整）")
+    parser.add_argument('--seed', type=int, default=None, help="随机种子（缺省时随机生成并记入 manifest）")
+    parser.add_argument('--format', choices=DATASET_FORMATS, default='parquet', help="落盘格式")
+    parser.add_argument('--daily-profile', default=None, help="24 个逗号分隔的小时权重")
+    parser.add_argument('--shock-scenarios', default=None, help="冲击场景 JSON 文件（列表，字段同 DEFAULT_SHOCK_SCENARIOS）")
+    parser.add_argument('--no-shocks', action='store_true', help="不启用任何冲击场景")
+    parser.add_argument('--chunk-days', type=int, default=None, help="每块生成的天数（默认等于进程数）")
+    parser.add_argument('--workers', type=int, default=1, help="并行进程数")
+    parser.add_argument('--overwrite', action='store_true', help="覆盖目录中已有的数据集")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    start_date = datetime.strptime(args.start_date, '%Y-%m-%d')
+    if args.total_records is not None:
+        records_per_day = math.ceil(args.total_records / max(1, args.days))
+    else:
+        records_per_day = args.records_per_day or 300
+
+    daily_profile = None
+    if args.daily_profile:
+        daily_profile = [float(w) for w in args.daily_profile.split(',')]
+        if len(daily_profile) != 24:
+            raise SystemExit("--daily-profile 需要 24 个小时权重")
+    if args.no_shocks:
+        shock_scenarios = []
+    elif args.shock_scenarios:
+        with open(args.shock_scenarios, encoding='utf-8') as f:
+            shock_scenarios = json.load(f)
+    else:
+        shock_scenarios = None
+
+    def report(done_days, total_days, rows):
+        print(f"\r已写入 {done_days}/{total_days} 天，{rows:,} 条记录", end='', file=sys.stderr, flush=True)
+
+    try:
+        manifest = build_benchmark_dataset(
+            args.output,
+            start_date,
+            args.days,
+            records_per_day,
+            seed=args.seed,
+            fmt=args.format,
+            daily_profile=daily_profile,
+            shock_scenarios=shock_scenarios,
+            chunk_days=args.chunk_days,
+            workers=args.workers,
+            overwrite=args.overwrite,
+            progress=report
+        )
+    except FileExistsError as e:
+        raise SystemExit(str(e))
+    print(file=sys.stderr)
+    print(
+        f"完成: {manifest['total_rows']:,} 条记录，{len(manifest['partitions'])} 个分区，"
+        f"格式 {manifest['format']}，耗时 {manifest['build_seconds']:.1f}s -> {args.output}"
+    )
+
+if __name__ == '__main__':
+    main()
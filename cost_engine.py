@@ -0,0 +1,1379 @@
+"""现金中心成本计算引擎
+
+地理距离表、单笔 / 批量成本计算、费率表、随机流与并行执行，以及列式与可配置的业务数据模拟器。
+"""
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import lru_cache
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+# ==================== 地理与距离相关函数 ====================
+
+def get_shanghai_area_classification():
+    """上海区域分类：市区、近郊、远郊"""
+    return {
+        # 市区（网点密集，标准公里数较少）
+        '市区': {
+            'regions': ['黄浦区', '徐汇区', '长宁区', '静安区', '普陀区', '虹口区', '杨浦区'],
+            'standard_km': {
+                '金库运送': 8,     # 市区金库运送标准8公里
+                '上门收款': 10,    # 市区上门收款标准10公里
+                '现金清点': 0      # 现金清点无距离费用
+            }
+        },
+        # 近郊（网点适中，标准公里数适中）
+        '近郊': {
+            'regions': ['闵行区', '宝山区', '嘉定区', '浦东新区'],
+            'standard_km': {
+                '金库运送': 30,    # 近郊金库运送标准30公里
+                '上门收款': 35,    # 近郊上门收款标准35公里
+                '现金清点': 0      # 现金清点无距离费用
+            }
+        },
+        # 远郊（网点稀少，标准公里数较多）
+        '远郊': {
+            'regions': ['金山区', '松江区', '青浦区', '奉贤区', '崇明区'],
+            'standard_km': {
+                '金库运送': 45,    # 远郊金库运送标准45公里
+                '上门收款': 50,    # 远郊上门收款标准50公里
+                '现金清点': 0      # 现金清点无距离费用
+            }
+        }
+    }
+
+def get_area_type(region):
+    """根据区域获取地区类型"""
+    area_classification = get_shanghai_area_classification()
+    for area_type, config in area_classification.items():
+        if region in config['regions']:
+            return area_type
+    return '近郊'  # 默认返回近郊
+
+def get_pudong_zhoupu_to_districts_distance():
+    """浦东新区周浦镇到上海各区的实际距离（公里）- 重新核实修正版"""
+    return {
+        # 市区 - 周浦位于浦东外环外，到市区距离较远
+        '黄浦区': 28,      # 周浦→外滩约28km
+        '徐汇区': 32,      # 周浦→徐家汇约32km  
+        '长宁区': 38,      # 周浦→中山公园约38km
+        '静安区': 30,      # 周浦→静安寺约30km
+        '普陀区': 42,      # 周浦→真如约42km
+        '虹口区': 35,      # 周浦→四川北路约35km
+        '杨浦区': 33,      # 周浦→五角场约33km
+        
+        # 近郊 - 周浦到邻近区域
+        '闵行区': 25,      # 周浦→莘庄约25km（相对较近）
+        '宝山区': 50,      # 周浦→宝山约50km（需跨越市区）
+        '嘉定区': 55,      # 周浦→嘉定约55km（距离较远）
+        '浦东新区': 20,    # 周浦→陆家嘴约15km
+        
+        # 远郊 - 周浦到远郊区域（重新核实）
+        '金山区': 60,      # 周浦→金山石化约60km（经G1501外环高速）
+        '松江区': 48,      # 周浦→松江新城约48km（经S32或G60高速）
+        '青浦区': 55,      # 周浦→青浦约55km（经S32高速）
+        '奉贤区': 28,      # 周浦→奉贤约28km（都在南部，较近）
+        '崇明区': 70       # 周浦→崇明约70km（含过隧道时间）
+    }
+
+def get_shanghai_area_classification_from_zhoupu():
+    """上海区域分类：从周浦出发的标准距离（基于修正距离重新分类）"""
+    return {
+        # 近距离区域（≤30km）
+        '近距离': {
+            'regions': ['浦东新区', '闵行区', '奉贤区', '黄浦区', '静安区'],
+            'standard_km': {
+                '金库运送': 25,    # 近距离标准25公里
+                '上门收款': 28,    # 近距离上门收款标准28公里
+                '现金清点': 0      # 现金清点无距离费用
+            }
+        },
+        # 中距离区域（30-40km）
+        '中距离': {
+            'regions': ['徐汇区', '杨浦区', '虹口区', '长宁区'],
+            'standard_km': {
+                '金库运送': 35,    # 中距离标准35公里
+                '上门收款': 38,    # 中距离上门收款标准38公里
+                '现金清点': 0      # 现金清点无距离费用
+            }
+        },
+        # 远距离区域（≥40km）
+        '远距离': {
+            'regions': ['普陀区', '松江区', '宝山区', '嘉定区', '青浦区', '金山区', '崇明区'],
+            'standard_km': {
+                '金库运送': 50,    # 远距离标准50公里
+                '上门收款': 55,    # 远距离上门收款标准55公里
+                '现金清点': 0      # 现金清点无距离费用
+            }
+        }
+    }
+
+def get_area_type_from_zhoupu(region):
+    """根据区域获取地区类型（基于周浦出发）"""
+    area_classification = get_shanghai_area_classification_from_zhoupu()
+    for area_type, config in area_classification.items():
+        if region in config['regions']:
+            return area_type
+    return '中距离'  # 默认返回中距离
+
+# ==================== 成本计算相关函数 ====================
+
+def calculate_cash_counting_cost(amount):
+    """现金清点成本计算函数"""
+    # 设定大笔清点阈值（100万以上为大笔）
+    large_amount_threshold = 1000000
+    
+    if amount >= large_amount_threshold:
+        # 大笔清点：2个人 + 机器
+        monthly_labor_cost = 15000 * 2
+        machine_cost = 2000000 / (30 * 12)  # 每月折旧成本
+        monthly_total_cost = monthly_labor_cost + machine_cost
+        
+        hourly_cost = monthly_total_cost / (22 * 8)
+        processing_hours = np.random.uniform(2, 4)
+        total_cost = hourly_cost * processing_hours
+        
+        return {
+            'total_cost': total_cost,
+            'labor_cost': (monthly_labor_cost / (22 * 8)) * processing_hours,
+            'equipment_cost': (machine_cost / (22 * 8)) * processing_hours,
+            'time_duration': processing_hours * 60,  # 转换为分钟
+            'counting_type': '大笔清点',
+            'staff_count': 2,
+            'has_machine': True,
+            'processing_hours': processing_hours
+        }
+    else:
+        # 小笔清点：8个人手工清点
+        avg_salary = np.random.uniform(7000, 8000)
+        monthly_labor_cost = avg_salary * 8
+        monthly_total_cost = monthly_labor_cost
+        
+        hourly_cost = monthly_total_cost / (22 * 8)
+        processing_hours = np.random.uniform(1, 3)
+        total_cost = hourly_cost * processing_hours
+        
+        return {
+            'total_cost': total_cost,
+            'labor_cost': total_cost,  # 小笔清点全部为人工成本
+            'equipment_cost': 0,       # 无设备成本
+            'time_duration': processing_hours * 60,  # 转换为分钟
+            'counting_type': '小笔清点',
+            'staff_count': 8,
+            'has_machine': False,
+            'processing_hours': processing_hours
+        }
+
+def calculate_vehicle_cost(distance_km, time_hours, region):
+    """统一运钞车成本计算函数"""
+    hourly_cost = 75000 / 30 / 8  # 312.5元/小时
+    basic_cost = time_hours * hourly_cost
+
+    area_type = get_area_type(region)
+    area_classification = get_shanghai_area_classification()
+    standard_distance = area_classification[area_type]['standard_km'].get('金库运送', 15)
+    standard_time = distance_km * 0.08 + 0.5
+
+    overtime_hours = max(0, time_hours - standard_time)
+    overtime_cost = overtime_hours * 300
+    over_km = max(0, distance_km - standard_distance)
+    over_km_cost = over_km * 12
+
+    return basic_cost + overtime_cost + over_km_cost, {
+        'basic_cost': basic_cost,
+        'overtime_cost': overtime_cost,
+        'over_km_cost': over_km_cost,
+        'standard_distance': standard_distance,
+        'area_type': area_type
+    }
+
+def calculate_vault_transfer_cost():
+    """金库调拨专用成本计算函数"""
+    hourly_cost = 75000 / 30 / 8
+    
+    base_minutes = np.random.uniform(35, 50)  # 35-50分钟（合理范围）
+    base_hours = base_minutes / 60
+    
+    overtime_minutes = np.random.uniform(10, 25) if np.random.random() < 0.15 else 0  # 15%概率超时
+    overtime_hours = overtime_minutes / 60
+    
+    over_km = np.random.uniform(0.5, 2) if np.random.random() < 0.05 else 0  # 5%概率超公里
+    
+    basic_cost = base_hours * hourly_cost
+    overtime_cost = overtime_hours * 300
+    over_km_cost = over_km * 12
+    total_vehicle_cost = basic_cost + overtime_cost + over_km_cost
+    total_time = base_minutes + overtime_minutes
+    
+    return {
+        'vehicle_cost': total_vehicle_cost,
+        'time_duration': total_time,
+        'basic_cost': basic_cost,
+        'overtime_cost': overtime_cost,
+        'over_km_cost': over_km_cost,
+        'distance_km': 15.0,
+        'standard_distance': 15,
+        'area_type': '专线',
+        'amount': np.random.uniform(5000000, 20000000)
+    }
+
+def calculate_realistic_time_duration_from_zhoupu(distance_km, business_type, traffic_factor=1.0):
+    """基于实际距离计算真实配送时间（从周浦出发）"""
+    if distance_km <= 30:  # 近距离
+        avg_speed = 35  # km/h，周浦到邻近区域
+    elif distance_km <= 45:  # 中距离
+        avg_speed = 32  # km/h，市区段较多，拥堵
+    else:  # 远距离（如松江、青浦等）
+        avg_speed = 45  # km/h，主要走高速公路
+    
+    base_driving_time = distance_km / avg_speed * 60  # 分钟
+    
+    operation_time = {
+        '金库运送': np.random.uniform(20, 40),
+        '上门收款': np.random.uniform(25, 50),
+        '金库调拨': np.random.uniform(35, 70),
+        '现金清点': np.random.uniform(80, 280)
+    }.get(business_type, 25)
+    
+    if distance_km > 45:  # 到远郊
+        traffic_delay = np.random.uniform(10, 20)
+    elif distance_km > 30:  # 到市区
+        traffic_delay = np.random.uniform(15, 25)
+    else:  # 近距离
+        traffic_delay = np.random.uniform(8, 15)
+    
+    total_time = (base_driving_time + operation_time + traffic_delay) * traffic_factor
+    variation = np.random.uniform(0.92, 1.08)
+    final_time = total_time * variation
+    
+    return max(25, final_time)
+
+def calculate_over_distance_cost(actual_distance, standard_distance, business_type):
+    """计算超距离成本（基于周浦的距离标准）"""
+    over_distance = max(0, actual_distance - standard_distance)
+    
+    over_distance_rate = {
+        '金库运送': 12,
+        '上门收款': 12,
+        '金库调拨': 12,
+        '现金清点': 0
+    }.get(business_type, 15)
+    
+    over_distance_cost = over_distance * over_distance_rate
+    
+    return {
+        'over_distance': over_distance,
+        'over_distance_cost': over_distance_cost,
+        'actual_distance': actual_distance,
+        'standard_distance': standard_distance
+    }
+
+# ==================== 列式（向量化）数据生成引擎 ====================
+
+BUSINESS_TYPES = ['金库运送', '上门收款', '金库调拨', '现金清点']
+BUSINESS_PROBABILITIES = [0.45, 0.20, 0.0625, 0.2875]
+
+MARKET_SCENARIOS = ['正常', '高需求期', '紧急状况', '节假日']
+MARKET_SCENARIO_PROBABILITIES = [0.6, 0.2, 0.1, 0.1]
+
+TIME_WEIGHTS = [1.0, 1.1, 1.3, 1.6]
+TIME_WEIGHT_PROBABILITIES = [0.4, 0.3, 0.2, 0.1]
+
+def lookup_by_name(names, mapping, default, dtype=float):
+    """按名称数组批量查表：先 factorize 成整数编码，再按唯一值查字典，避免逐元素字符串比较"""
+    codes, uniques = pd.factorize(np.asarray(names, dtype=object))
+    table = np.array([mapping.get(name, default) for name in uniques] + [default], dtype=dtype)
+    return table[codes]
+
+# ==================== 费率表（编译后的整数编码查表） ====================
+
+class RateCard:
+    """编译后的费率表：区域、业务类型统一编码为整数，各项费率预先展开为查表数组。
+
+    逐笔函数每次调用都会重建嵌套字典并线性扫描区域列表；RateCard 只在构造时编译一次:
+        region_area_code[区域码]               -> 周浦标准下的地区类型码（近距离/中距离/远距离）
+        standard_km[地区类型码, 业务码]         -> 周浦标准公里数
+        over_distance_rate[业务码]             -> 超距离单价（元/公里）
+        base_distance[区域码]                  -> 周浦到该区的基准距离（公里）
+        region_vehicle_area_code[区域码]       -> 运钞车成本用的地区类型码（市区/近郊/远郊）
+        vehicle_standard_km[运钞车地区类型码]   -> 运钞车标准公里数
+    未登记的区域 / 业务类型统一编码为各自表长（最后一格），取值与逐笔函数的默认值一致。
+    version 为费率内容的摘要，内容不变则版本不变，可直接用作缓存键。
+    """
+
+    def __init__(
+        self,
+        region_distance: dict | None = None,
+        area_classification: dict | None = None,
+        vehicle_area_classification: dict | None = None,
+        over_distance_rates: dict | None = None,
+        business_types: list | None = None,
+        default_area: str = '中距离',
+        default_vehicle_area: str = '近郊',
+        default_standard_km: float = 35,
+        default_vehicle_standard_km: float = 15,
+        default_over_distance_rate: float = 15
+    ):
+        if region_distance is None:
+            region_distance = get_pudong_zhoupu_to_districts_distance()
+        if area_classification is None:
+            area_classification = get_shanghai_area_classification_from_zhoupu()
+        if vehicle_area_classification is None:
+            vehicle_area_classification = get_shanghai_area_classification()
+        if over_distance_rates is None:
+            over_distance_rates = {'金库运送': 12, '上门收款': 12, '金库调拨': 12, '现金清点': 0}
+        if business_types is None:
+            business_types = BUSINESS_TYPES
+
+        self.region_names = list(region_distance.keys())
+        self.business_types = list(business_types)
+        self.area_names = list(area_classification.keys())
+        self.vehicle_area_names = list(vehicle_area_classification.keys())
+        self.region_index = {name: i for i, name in enumerate(self.region_names)}
+        self.business_index = {name: i for i, name in enumerate(self.business_types)}
+
+        region_area = {r: name for name, config in area_classification.items() for r in config['regions']}
+        region_vehicle_area = {r: name for name, config in vehicle_area_classification.items() for r in config['regions']}
+        self.region_area_code = np.array(
+            [self.area_names.index(region_area.get(r, default_area)) for r in self.region_names] +
+            [self.area_names.index(default_area)]
+        )
+        self.region_vehicle_area_code = np.array(
+            [self.vehicle_area_names.index(region_vehicle_area.get(r, default_vehicle_area)) for r in self.region_names] +
+            [self.vehicle_area_names.index(default_vehicle_area)]
+        )
+        self.base_distance = np.array(list(region_distance.values()) + [np.nan], dtype=float)
+        # 行=地区类型，列=业务类型（最后一列为未知业务类型）
+        self.standard_km = np.array([
+            [config['standard_km'].get(b_type, default_standard_km) for b_type in self.business_types] + [default_standard_km]
+            for config in area_classification.values()
+        ], dtype=float)
+        self.vehicle_standard_km = np.array([
+            config['standard_km'].get('金库运送', default_vehicle_standard_km)
+            for config in vehicle_area_classification.values()
+        ], dtype=float)
+        self.over_distance_rate = np.array(
+            [over_distance_rates.get(b_type, default_over_distance_rate) for b_type in self.business_types] +
+            [default_over_distance_rate],
+            dtype=float
+        )
+
+        tables = {
+            'region_distance': region_distance,
+            'area_classification': area_classification,
+            'vehicle_area_classification': vehicle_area_classification,
+            'over_distance_rates': over_distance_rates,
+            'business_types': self.business_types,
+            'defaults': [default_area, default_vehicle_area, default_standard_km,
+                         default_vehicle_standard_km, default_over_distance_rate]
+        }
+        digest = hashlib.sha1(json.dumps(tables, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8'))
+        self.version = digest.hexdigest()[:16]
+
+    def __repr__(self):
+        return f"RateCard(version={self.version!r}, regions={len(self.region_names)}, business_types={len(self.business_types)})"
+
+    @staticmethod
+    def _encode(values, index):
+        """名称数组 -> 整数编码（已是整数编码时原样返回；Categorical 只对类别取值查表）"""
+        if isinstance(values, (pd.Series, pd.Index)):
+            values = values.array
+        if isinstance(values, pd.Categorical):
+            table = np.array([index.get(c, len(index)) for c in values.categories] + [len(index)])
+            return table[values.codes]
+        values = np.asarray(values)
+        if np.issubdtype(values.dtype, np.integer):
+            return values
+        return lookup_by_name(values, index, len(index), dtype=int)
+
+    def encode_regions(self, regions):
+        """区域名称 -> 区域码（未登记区域为 len(region_names)）"""
+        return self._encode(regions, self.region_index)
+
+    def encode_business_types(self, business_types):
+        """业务类型名称 -> 业务码（未登记业务类型为 len(business_types)）"""
+        return self._encode(business_types, self.business_index)
+
+    def lookup(self, region_codes, business_codes):
+        """按（区域码, 业务码）批量查表，返回各项费率数组（也接受名称数组，自动编码）"""
+        region_codes = self.encode_regions(region_codes)
+        business_codes = self.encode_business_types(business_codes)
+        area_code = self.region_area_code[region_codes]
+        vehicle_area_code = self.region_vehicle_area_code[region_codes]
+        return {
+            'area_code': area_code,
+            'standard_km': self.standard_km[area_code, business_codes],
+            'over_distance_rate': self.over_distance_rate[business_codes],
+            'base_distance': self.base_distance[region_codes],
+            'vehicle_area_code': vehicle_area_code,
+            'vehicle_standard_km': self.vehicle_standard_km[vehicle_area_code]
+        }
+
+    def area_types(self, region_codes):
+        """区域 -> 地区类型名称（周浦标准）"""
+        return np.array(self.area_names, dtype=object)[self.region_area_code[self.encode_regions(region_codes)]]
+
+    def vehicle_area_types(self, region_codes):
+        """区域 -> 地区类型名称（运钞车成本标准：市区/近郊/远郊）"""
+        return np.array(self.vehicle_area_names, dtype=object)[self.region_vehicle_area_code[self.encode_regions(region_codes)]]
+
+@lru_cache(maxsize=1)
+def get_default_rate_card():
+    """按内置距离表与地区分类编译的默认费率表（进程内只编译一次）"""
+    return RateCard()
+
+def draw_realistic_time_duration_from_zhoupu(distance_km, business_type, traffic_factor, rng=None):
+    """calculate_realistic_time_duration_from_zhoupu 的向量化版本（数组进、数组出）"""
+    rng = np.random if rng is None else rng
+    distance_km = np.asarray(distance_km, dtype=float)
+    n = len(distance_km)
+
+    avg_speed = np.select([distance_km <= 30, distance_km <= 45], [35.0, 32.0], default=45.0)
+    base_driving_time = distance_km / avg_speed * 60
+
+    operation_range = {
+        '金库运送': (20, 40),
+        '上门收款': (25, 50),
+        '金库调拨': (35, 70),
+        '现金清点': (80, 280)
+    }
+    operation_low = lookup_by_name(business_type, {k: v[0] for k, v in operation_range.items()}, 25)
+    operation_high = lookup_by_name(business_type, {k: v[1] for k, v in operation_range.items()}, 25)
+    operation_time = rng.uniform(operation_low, operation_high)
+
+    delay_low = np.select([distance_km > 45, distance_km > 30], [10.0, 15.0], default=8.0)
+    delay_high = np.select([distance_km > 45, distance_km > 30], [20.0, 25.0], default=15.0)
+    traffic_delay = rng.uniform(delay_low, delay_high)
+
+    total_time = (base_driving_time + operation_time + traffic_delay) * traffic_factor
+    variation = rng.uniform(0.92, 1.08, n)
+    return np.maximum(25, total_time * variation)
+
+def calculate_cash_counting_cost_batch(amount, rng=None):
+    """calculate_cash_counting_cost 的向量化版本，返回按列组织的数组字典"""
+    rng = np.random if rng is None else rng
+    amount = np.asarray(amount, dtype=float)
+    n = len(amount)
+    is_large = amount >= 1000000
+
+    # 大笔清点：2个人 + 机器；小笔清点：8个人手工清点
+    large_hourly_labor = 15000 * 2 / (22 * 8)
+    large_hourly_machine = 2000000 / (30 * 12) / (22 * 8)
+    small_hourly_labor = rng.uniform(7000, 8000, n) * 8 / (22 * 8)
+
+    processing_hours = np.where(is_large, rng.uniform(2, 4, n), rng.uniform(1, 3, n))
+    labor_cost = np.where(is_large, large_hourly_labor, small_hourly_labor) * processing_hours
+    equipment_cost = np.where(is_large, large_hourly_machine * processing_hours, 0.0)
+
+    return {
+        'total_cost': labor_cost + equipment_cost,
+        'labor_cost': labor_cost,
+        'equipment_cost': equipment_cost,
+        'time_duration': processing_hours * 60,
+        'counting_type': np.where(is_large, '大笔清点', '小笔清点'),
+        'staff_count': np.where(is_large, 2, 8),
+        'has_machine': is_large,
+        'processing_hours': processing_hours
+    }
+
+def calculate_vault_transfer_cost_batch(n, rng=None):
+    """calculate_vault_transfer_cost 的向量化版本（一次生成 n 笔金库调拨）"""
+    rng = np.random if rng is None else rng
+    hourly_cost = 75000 / 30 / 8
+
+    base_minutes = rng.uniform(35, 50, n)
+    overtime_minutes = np.where(rng.random(n) < 0.15, rng.uniform(10, 25, n), 0.0)  # 15%概率超时
+    over_km = np.where(rng.random(n) < 0.05, rng.uniform(0.5, 2, n), 0.0)  # 5%概率超公里
+
+    basic_cost = base_minutes / 60 * hourly_cost
+    overtime_cost = overtime_minutes / 60 * 300
+    over_km_cost = over_km * 12
+
+    return {
+        'vehicle_cost': basic_cost + overtime_cost + over_km_cost,
+        'time_duration': base_minutes + overtime_minutes,
+        'basic_cost': basic_cost,
+        'overtime_cost': overtime_cost,
+        'over_km_cost': over_km_cost
+    }
+
+def calculate_vehicle_cost_batch(distance_km, time_hours, region, rate_card=None):
+    """calculate_vehicle_cost 的向量化版本，region 为区域名称数组或 RateCard 区域码"""
+    rate_card = get_default_rate_card() if rate_card is None else rate_card
+    distance_km = np.asarray(distance_km, dtype=float)
+    time_hours = np.asarray(time_hours, dtype=float)
+    hourly_cost = 75000 / 30 / 8  # 312.5元/小时
+
+    region_codes = rate_card.encode_regions(region)
+    vehicle_area_code = rate_card.region_vehicle_area_code[region_codes]
+    standard_distance = rate_card.vehicle_standard_km[vehicle_area_code]
+
+    basic_cost = time_hours * hourly_cost
+    standard_time = distance_km * 0.08 + 0.5
+    overtime_cost = np.maximum(0, time_hours - standard_time) * 300
+    over_km_cost = np.maximum(0, distance_km - standard_distance) * 12
+
+    return basic_cost + overtime_cost + over_km_cost, {
+        'basic_cost': basic_cost,
+        'overtime_cost': overtime_cost,
+        'over_km_cost': over_km_cost,
+        'standard_distance': standard_distance,
+        'area_type': np.array(rate_card.vehicle_area_names, dtype=object)[vehicle_area_code]
+    }
+
+def get_zhoupu_standard_distance_batch(region, business_type, rate_card=None):
+    """按（区域, 业务类型）批量查询周浦出发的标准公里数，未配置的业务类型按35公里"""
+    rate_card = get_default_rate_card() if rate_card is None else rate_card
+    return rate_card.lookup(region, business_type)['standard_km']
+
+def calculate_over_distance_cost_batch(actual_distance, standard_distance, business_type, rate_card=None):
+    """calculate_over_distance_cost 的向量化版本"""
+    rate_card = get_default_rate_card() if rate_card is None else rate_card
+    over_distance = np.maximum(0, np.asarray(actual_distance, dtype=float) - standard_distance)
+    over_distance_rate = rate_card.over_distance_rate[rate_card.encode_business_types(business_type)]
+    return {
+        'over_distance': over_distance,
+        'over_distance_cost': over_distance * over_distance_rate
+    }
+
+BATCH_COST_COLUMNS = [
+    'vehicle_cost', 'labor_cost', 'equipment_cost', 'over_distance_cost',
+    'standard_distance', 'over_distance', 'area_type', 'basic_cost',
+    'overtime_cost', 'over_km_cost', 'counting_type', 'staff_count', 'has_machine'
+]
+
+def calculate_batch_costs(business_type, region, distance_km, time_duration, amount, rng=None, rate_card=None):
+    """四类业务统一的批量成本计算内核（数组进、数组出，按业务类型掩码分支）
+
+    参数:
+        business_type, region, distance_km, time_duration, amount: 等长数组
+        rng: 随机数来源（np.random 或 np.random.Generator），用于清点工时与调拨超时等随机成分
+        rate_card: RateCard 费率表，默认使用 get_default_rate_card()
+
+    返回:
+        dict: BATCH_COST_COLUMNS 各列数组，另含 processing_hours（现金清点工时，其余为0）
+
+    说明:
+        与逐笔函数保持一致：现金清点的工时、金库调拨的时长/超时/超公里均在内核中按原分布
+        独立抽取，不使用传入的 time_duration；time_duration 仅用于金库运送/上门收款的超时计算。
+    """
+    rng = np.random if rng is None else rng
+    rate_card = get_default_rate_card() if rate_card is None else rate_card
+    business_type = np.asarray(business_type, dtype=object)
+    region_codes = rate_card.encode_regions(np.asarray(region, dtype=object))
+    business_codes = rate_card.encode_business_types(business_type)
+    distance_km = np.asarray(distance_km, dtype=float)
+    time_duration = np.asarray(time_duration, dtype=float)
+    amount = np.asarray(amount, dtype=float)
+    n_records = len(business_type)
+
+    is_vault = business_codes == rate_card.business_index.get('金库调拨', -1)
+    is_counting = business_codes == rate_card.business_index.get('现金清点', -1)
+    is_vehicle = ~is_vault & ~is_counting
+
+    # 标准距离与超距
+    standard_distance = get_zhoupu_standard_distance_batch(region_codes, business_codes, rate_card)
+    over_info = calculate_over_distance_cost_batch(distance_km, standard_distance, business_codes, rate_card)
+
+    vehicle_cost = np.zeros(n_records)
+    labor_cost = np.zeros(n_records)
+    equipment_cost = np.zeros(n_records)
+    over_distance_cost = np.zeros(n_records)
+    basic_cost = np.zeros(n_records)
+    overtime_cost = np.zeros(n_records)
+    over_km_cost = np.zeros(n_records)
+    processing_hours = np.zeros(n_records)
+    area_type = np.full(n_records, '', dtype=object)
+    counting_type = np.full(n_records, '', dtype=object)
+    staff_count = np.zeros(n_records, dtype=int)
+    has_machine = np.zeros(n_records, dtype=bool)
+
+    # 现金清点：全部为人工/设备成本
+    counting = calculate_cash_counting_cost_batch(amount[is_counting], rng=rng)
+    labor_cost[is_counting] = counting['labor_cost']
+    equipment_cost[is_counting] = counting['equipment_cost']
+    processing_hours[is_counting] = counting['processing_hours']
+    area_type[is_counting] = '清点中心'
+    counting_type[is_counting] = counting['counting_type']
+    staff_count[is_counting] = counting['staff_count']
+    has_machine[is_counting] = counting['has_machine']
+
+    # 金库调拨：专线车辆成本，超公里费用按周浦标准计
+    vault = calculate_vault_transfer_cost_batch(int(is_vault.sum()), rng=rng)
+    vehicle_cost[is_vault] = vault['vehicle_cost']
+    basic_cost[is_vault] = vault['basic_cost']
+    overtime_cost[is_vault] = vault['overtime_cost']
+    area_type[is_vault] = '专线'
+
+    # 金库运送 / 上门收款：运钞车成本 + 里程设备成本
+    vehicle, vehicle_detail = calculate_vehicle_cost_batch(
+        distance_km[is_vehicle], time_duration[is_vehicle] / 60, region_codes[is_vehicle], rate_card
+    )
+    vehicle_cost[is_vehicle] = vehicle
+    equipment_cost[is_vehicle] = distance_km[is_vehicle] * 2.8
+    basic_cost[is_vehicle] = vehicle_detail['basic_cost']
+    overtime_cost[is_vehicle] = vehicle_detail['overtime_cost']
+    area_type[is_vehicle] = vehicle_detail['area_type']
+
+    over_distance_cost[~is_counting] = over_info['over_distance_cost'][~is_counting]
+    over_km_cost[~is_counting] = over_info['over_distance_cost'][~is_counting]
+
+    return {
+        'vehicle_cost': vehicle_cost,
+        'labor_cost': labor_cost,
+        'equipment_cost': equipment_cost,
+        'over_distance_cost': over_distance_cost,
+        'standard_distance': standard_distance,
+        'over_distance': over_info['over_distance'],
+        'area_type': area_type,
+        'basic_cost': basic_cost,
+        'overtime_cost': overtime_cost,
+        'over_km_cost': over_km_cost,
+        'counting_type': counting_type,
+        'staff_count': staff_count,
+        'has_machine': has_machine,
+        'processing_hours': processing_hours
+    }
+
+def generate_sample_columns(n_records, rng=None, txn_offset=0):
+    """列式生成 generate_sample_data 的业务与成本列（整列数组运算，无逐行循环）
+
+    与逐行版本保持相同的列和分布；start_time、total_cost、anomaly_reason 等
+    汇总列由调用方在此基础上统一补充。txn_offset 为流水号起点（分块生成时使用）。
+    """
+    rng = np.random if rng is None else rng
+    distance_data = get_pudong_zhoupu_to_districts_distance()
+    regions = np.array(list(distance_data.keys()), dtype=object)
+    base_distances = np.array(list(distance_data.values()), dtype=float)
+
+    # 业务类型与区域
+    business_code = rng.choice(len(BUSINESS_TYPES), n_records, p=BUSINESS_PROBABILITIES)
+    business_type = np.array(BUSINESS_TYPES, dtype=object)[business_code]
+    is_vault = business_code == BUSINESS_TYPES.index('金库调拨')
+    is_counting = business_code == BUSINESS_TYPES.index('现金清点')
+
+    region_idx = rng.choice(len(regions), n_records)
+    region = regions[region_idx]
+    region[is_vault] = '浦东新区'
+    distance_km = np.where(is_vault, 15.0, base_distances[region_idx] * rng.uniform(0.9, 1.1, n_records))
+
+    # 时长：金库调拨为固定区间+超时，其余按距离估算实际配送时间
+    time_duration = np.empty(n_records)
+    n_vault = int(is_vault.sum())
+    vault_minutes = rng.uniform(35, 50, n_vault)
+    vault_minutes += np.where(rng.random(n_vault) < 0.15, rng.uniform(10, 25, n_vault), 0.0)
+    time_duration[is_vault] = vault_minutes
+    traffic_factor = rng.uniform(0.85, 1.35, int((~is_vault).sum()))
+    time_duration[~is_vault] = draw_realistic_time_duration_from_zhoupu(
+        distance_km[~is_vault], business_type[~is_vault], traffic_factor, rng=rng
+    )
+
+    # 金额
+    amount = rng.uniform(10000, 1000000, n_records)
+    amount[is_vault] = rng.uniform(5000000, 20000000, n_vault)
+    n_counting = int(is_counting.sum())
+    amount[is_counting] = np.where(
+        rng.random(n_counting) < 0.3,
+        rng.uniform(1000000, 10000000, n_counting),
+        rng.uniform(10000, 800000, n_counting)
+    )
+
+    df = pd.DataFrame({
+        'txn_id': [f'TXN{i:06d}' for i in range(txn_offset, txn_offset + n_records)],
+        'business_type': business_type,
+        'region': region,
+        'amount': amount,
+        'distance_km': distance_km,
+        'time_duration': time_duration,
+        'efficiency_ratio': rng.beta(3, 2, n_records),
+        'is_anomaly': rng.choice([True, False], n_records, p=[0.1, 0.9]),
+        'market_scenario': rng.choice(MARKET_SCENARIOS, n_records, p=MARKET_SCENARIO_PROBABILITIES),
+        'time_weight': rng.choice(TIME_WEIGHTS, n_records, p=TIME_WEIGHT_PROBABILITIES)
+    })
+
+    costs = calculate_batch_costs(business_type, region, distance_km, time_duration, amount, rng=rng)
+    for col in BATCH_COST_COLUMNS:
+        df[col] = costs[col]
+    return df
+
+SAMPLE_CHUNK_SIZE = 250_000
+
+def sample_chunk_task(task):
+    """进程池任务：按（entropy, 块序号）重建随机流并列式生成一块示例数据"""
+    entropy, chunk_index, n_records, txn_offset = task
+    return generate_sample_columns(n_records, rng=task_rng(entropy, 0, chunk_index), txn_offset=txn_offset)
+
+def generate_sample_columns_parallel(n_records, seed=None, workers=1, chunk_size=SAMPLE_CHUNK_SIZE):
+    """按固定块大小分块列式生成，每块使用 SeedSequence 派生的独立随机流
+
+    块划分只取决于 n_records 与 chunk_size，因此同一 seed 的结果与 workers 无关、可逐位复现。
+    """
+    entropy = resolve_entropy(seed)
+    starts = range(0, max(1, int(n_records)), chunk_size)
+    tasks = [(entropy, k, min(chunk_size, n_records - start), start) for k, start in enumerate(starts)]
+    with parallel_executor(workers) as executor:
+        return pd.concat(run_tasks(sample_chunk_task, tasks, executor), ignore_index=True)
+
+# ==================== 业务时间戳采样 ====================
+
+# 每小时的业务权重（7-18点），早上和下午业务量更多
+BUSINESS_HOUR_WEIGHTS = {
+    7: 0.15,   # 早上开始，业务量较多
+    8: 0.20,   # 上班高峰，业务量多
+    9: 0.18,   # 上午忙碌时段
+    10: 0.12,  # 上午正常时段
+    11: 0.10,  # 上午后期
+    12: 0.05,  # 午休时间，业务量少
+    13: 0.08,  # 下午开始
+    14: 0.15,  # 下午忙碌时段，业务量较多
+    15: 0.18,  # 下午高峰，业务量多
+    16: 0.16,  # 下午忙碌时段
+    17: 0.12,  # 下班前，业务量较多
+    18: 0.08   # 下班时间，业务量减少
+}
+
+def business_hour_profile(off_hours_weight=0.0):
+    """由 BUSINESS_HOUR_WEIGHTS 构造24小时权重数组，非营业时段使用 off_hours_weight"""
+    profile = np.full(24, float(off_hours_weight))
+    for hour, weight in BUSINESS_HOUR_WEIGHTS.items():
+        profile[hour] = weight
+    return profile
+
+def sample_business_timestamps(n_records, start_date, days=1, daily_profile=None, rng=None, sort=False):
+    """批量生成业务时间戳：在 start_date 起的 days 天内均匀选日，按24小时权重选小时，小时内均匀到秒
+
+    参数:
+        n_records: 记录条数
+        start_date: 起始日期（仅日期部分有效）
+        days: 覆盖天数
+        daily_profile: 24长度的小时权重（无需归一化）；None 时使用 7-18 点业务权重
+        rng: 随机数来源（np.random 或 np.random.Generator）
+        sort: 是否按时间升序排列
+
+    返回:
+        np.ndarray: datetime64[ns] 数组
+    """
+    rng = np.random if rng is None else rng
+    profile = business_hour_profile() if daily_profile is None else np.asarray(daily_profile, dtype=float)
+    if profile.shape != (24,):
+        raise ValueError('daily_profile 需为24长度的小时权重数组')
+    profile = profile / profile.sum()
+
+    n_records = int(n_records)
+    day_offset = rng.choice(max(1, int(days)), n_records)
+    hour = rng.choice(24, n_records, p=profile)
+    second_in_hour = rng.choice(3600, n_records)
+    offset_seconds = (day_offset * 86400 + hour * 3600 + second_in_hour).astype('int64')
+
+    base = pd.Timestamp(start_date).normalize().to_datetime64().astype('datetime64[ns]')
+    timestamps = base + offset_seconds.astype('timedelta64[s]').astype('timedelta64[ns]')
+    if sort:
+        timestamps.sort()
+    return timestamps
+
+# ==================== 异常原因标注 ====================
+
+# 异常原因类别（按判定优先级排列）：高成本、长耗时、远距离、低效率、其他
+ANOMALY_REASON_GROUPS = [
+    ['设备故障延误', '路线拥堵严重', '人员配置不足', '紧急调度变更'],
+    ['操作流程复杂', '等待时间过长', '交接手续繁琐', '安全检查延时'],
+    ['最优路线受阻', '临时改道', 'GPS导航偏差', '交通管制影响'],
+    ['人员操作失误', '系统响应缓慢', '协调配合问题', '应急预案启动'],
+    ['天气因素影响', '客户特殊要求', '监管部门检查', '突发安全事件']
+]
+
+def compute_anomaly_thresholds(df):
+    """计算异常判定分位阈值（整表只算一次）"""
+    return {
+        'total_cost': df['total_cost'].quantile(0.9),
+        'time_duration': df['time_duration'].quantile(0.85),
+        'distance_km': df['distance_km'].quantile(0.8)
+    }
+
+def assign_anomaly_reasons(df, thresholds=None, rng=None):
+    """向量化异常原因标注：阈值一次算出，按掩码优先级选类别，再在类别内随机取原因
+
+    参数:
+        df: 含 is_anomaly、total_cost、time_duration、distance_km、efficiency_ratio 列
+        thresholds: compute_anomaly_thresholds 的结果；None 时按 df 自身计算
+        rng: 随机数来源（np.random 或 np.random.Generator）
+
+    返回:
+        np.ndarray: 每行的异常原因，非异常为 '正常'
+    """
+    rng = np.random if rng is None else rng
+    if thresholds is None:
+        thresholds = compute_anomaly_thresholds(df)
+
+    category = np.select(
+        [
+            df['total_cost'].to_numpy() > thresholds['total_cost'],
+            df['time_duration'].to_numpy() > thresholds['time_duration'],
+            df['distance_km'].to_numpy() > thresholds['distance_km'],
+            df['efficiency_ratio'].to_numpy() < 0.3
+        ],
+        [0, 1, 2, 3],
+        default=4
+    )
+    reason_table = np.array(ANOMALY_REASON_GROUPS, dtype=object)
+    picks = rng.choice(reason_table.shape[1], len(df))
+    return np.where(df['is_anomaly'].to_numpy(dtype=bool), reason_table[category, picks], '正常')
+
+# ==================== 流式分位数估计 ====================
+
+# 分位数估计器的桶数上限：超出时把最低的若干桶并入保留的最低桶（同 DDSketch 的 collapse）
+SKETCH_MAX_BUCKETS = 4096
+
+class LogHistogramQuantileSketch:
+    """对数分桶的流式分位数估计器（固定内存、可合并）
+
+    非负数值按 (1+relative_accuracy) 的等比区间计数，分位数的相对误差不超过 relative_accuracy；
+    桶数组按需扩展但不超过 max_buckets 个，超出时合并最低的桶：状态大小有上界，与样本量和数值跨度无关，
+    落在最高桶以下 max_buckets 个桶之外的低分位数会偏高（取值为保留的最低桶）。
+    """
+
+    def __init__(self, relative_accuracy=0.001, max_buckets=SKETCH_MAX_BUCKETS):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = int(max_buckets)
+        self._gamma_log = np.log1p(2 * relative_accuracy / (1 - relative_accuracy))
+        self._offset = None
+        self._counts = np.zeros(0, dtype=np.int64)
+        self.zero_count = 0
+        self.count = 0
+
+    def update(self, values):
+        """批量加入样本"""
+        values = np.asarray(values, dtype=float).ravel()
+        if len(values) == 0:
+            return
+        low = values.min()
+        if np.isnan(low):
+            values = values[~np.isnan(values)]
+            if len(values) == 0:
+                return
+            low = values.min()
+        if low < 0:
+            raise ValueError('LogHistogramQuantileSketch 仅支持非负数值')
+        self.count += len(values)
+        if low == 0:
+            positive = values[values > 0]
+            self.zero_count += len(values) - len(positive)
+            if len(positive) == 0:
+                return
+            low = positive.min()
+        else:
+            positive = values
+        # 桶号 = ceil(log(x) / log γ)；原地计算，避免逐步产生临时数组
+        keys = np.log(positive)
+        keys *= 1.0 / self._gamma_log
+        np.ceil(keys, out=keys)
+        keys = keys.astype(np.intp)
+        # 数值跨度超过桶数上限时，先把远低于最高桶的键截到可保留的范围，避免 bincount 产生超长数组；
+        # 最高桶由批内最大值估计，差一个桶时由 _add_counts 的合并补足
+        top = int(np.ceil(np.log(positive.max()) / self._gamma_log))
+        if self._offset is not None:
+            top = max(top, self._offset + len(self._counts) - 1)
+        floor = top - self.max_buckets + 1
+        if np.log(low) / self._gamma_log < floor:
+            np.maximum(keys, floor, out=keys)
+        offset = int(keys.min())
+        keys -= offset
+        self._add_counts(offset, np.bincount(keys))
+
+    def merge(self, other):
+        """合并另一个同精度的估计器（用于分块/多进程汇总）"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('仅能合并相同精度的 LogHistogramQuantileSketch')
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if other._offset is not None:
+            self._add_counts(other._offset, other._counts)
+        return self
+
+    def _add_counts(self, offset, counts):
+        if self._offset is None:
+            self._offset = offset
+            self._counts = counts.astype(np.int64)
+        else:
+            low = min(self._offset, offset)
+            high = max(self._offset + len(self._counts), offset + len(counts))
+            merged = np.zeros(high - low, dtype=np.int64)
+            merged[self._offset - low:self._offset - low + len(self._counts)] += self._counts
+            merged[offset - low:offset - low + len(counts)] += counts
+            self._offset = low
+            self._counts = merged
+        excess = len(self._counts) - self.max_buckets
+        if excess > 0:
+            self._counts[excess] += self._counts[:excess].sum()
+            self._counts = self._counts[excess:].copy()
+            self._offset += excess
+
+    def quantile(self, q):
+        """估计分位数，q 可为标量或数组（0-1）"""
+        if self.count == 0:
+            return np.nan
+        q = np.asarray(q, dtype=float)
+        rank = q * (self.count - 1)
+        cumulative = self.zero_count + np.cumsum(self._counts)
+        bucket = np.searchsorted(cumulative, rank, side='right')
+        bucket = np.minimum(bucket, max(len(self._counts) - 1, 0))
+        # 桶中心值：2γ^k/(γ+1)
+        gamma = np.exp(self._gamma_log)
+        estimate = 2 * np.exp((self._offset + bucket) * self._gamma_log) / (gamma + 1) if self._offset is not None else 0.0
+        return np.where(rank < self.zero_count, 0.0, estimate)
+
+# ==================== 随机流与并行执行 ====================
+
+def task_rng(entropy, *spawn_key):
+    """由根熵与任务键派生独立随机流（SeedSequence），结果只取决于任务键，与执行顺序和进程数无关"""
+    return np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=spawn_key))
+
+def resolve_entropy(seed=None):
+    """seed 为 None 时生成新的随机熵；否则直接使用 seed"""
+    return np.random.SeedSequence(seed).entropy
+
+@contextmanager
+def parallel_executor(workers=1):
+    """workers>1 时提供进程池，否则给出 None（串行执行）"""
+    if workers is None or workers <= 1:
+        yield None
+        return
+    with ProcessPoolExecutor(max_workers=int(workers)) as executor:
+        yield executor
+
+def run_tasks(func, tasks, executor=None):
+    """依次执行任务；给定进程池时并行执行，结果顺序与任务顺序一致"""
+    if executor is None:
+        return [func(task) for task in tasks]
+    return list(executor.map(func, tasks))
+
+# ==================== 可配置业务数据模拟器 ====================
+
+DEFAULT_SHOCK_SCENARIOS = [
+    {'name': '高需求期', 'prob': 0.12, 'multiplier': 1.10, 'target_types': None},
+    {'name': '紧急状况', 'prob': 0.05, 'multiplier': 1.45, 'target_types': None},
+    {'name': '节假日', 'prob': 0.08, 'multiplier': 1.50, 'target_types': None}
+]
+
+# 场景名对应的成本乘子（与 generate_sample_data 的 market_scenario 映射一致）
+SHOCK_SCENARIO_MULTIPLIERS = {'高需求期': 1.1, '紧急状况': 1.5, '节假日': 1.5}
+
+def resolve_hour_probs(daily_profile=None):
+    """24长度的小时权重；未给出或长度不符时复用 7-18 点权重，其他小时设极低权重"""
+    if daily_profile is not None and len(daily_profile) == 24:
+        hour_probs = np.array(daily_profile, dtype=float)
+    else:
+        hour_probs = business_hour_profile(off_hours_weight=0.01)
+    return hour_probs / hour_probs.sum()
+
+def day_random_generators(entropy, day_index):
+    """第 day_index 天的（数据, 标注）两个独立随机流，只由 entropy 与天序号决定，与生成顺序无关"""
+    return task_rng(entropy, day_index, 0), task_rng(entropy, day_index, 1)
+
+def simulate_business_day(day_date, n_records, hour_probs, shock_scenarios, rng):
+    """模拟单日业务记录（整天一次性数组抽取；尚未做异常标注）"""
+    # 根据冲击 / 节假日等决定当天是否套用场景（允许多个场景叠加）
+    active_shocks = []
+    cost_multiplier_day = 1.0
+    for sc in shock_scenarios:
+        if rng.random() < sc.get('prob', 0):
+            active_shocks.append(sc['name'])
+            cost_multiplier_day *= sc.get('multiplier', 1.0)
+
+    start_time = sample_business_timestamps(n_records, day_date, daily_profile=hour_probs, rng=rng)
+
+    distance_map = get_pudong_zhoupu_to_districts_distance()
+    regions = np.array(list(distance_map.keys()), dtype=object)
+    base_distances = np.array(list(distance_map.values()), dtype=float)
+
+    b_type = np.array(BUSINESS_TYPES, dtype=object)[rng.choice(len(BUSINESS_TYPES), n_records, p=BUSINESS_PROBABILITIES)]
+    is_vault = b_type == '金库调拨'
+    is_counting = b_type == '现金清点'
+    is_vehicle = ~is_vault & ~is_counting
+
+    region_idx = rng.choice(len(regions), n_records)
+    region = regions[region_idx]
+    region[is_vault] = '浦东新区'
+    distance_km = np.where(is_vault, 15.0, base_distances[region_idx] * rng.uniform(0.9, 1.1, n_records))
+
+    # 时间 / 金额逻辑复用（现金清点时长在成本内核中由清点工时得出）
+    time_duration = np.zeros(n_records)
+    n_vault = int(is_vault.sum())
+    vault_minutes = rng.uniform(35, 50, n_vault)
+    vault_minutes += np.where(rng.random(n_vault) < 0.15, rng.uniform(10, 25, n_vault), 0.0)
+    time_duration[is_vault] = vault_minutes
+    traffic_factor = rng.uniform(0.85, 1.35, int(is_vehicle.sum()))
+    time_duration[is_vehicle] = draw_realistic_time_duration_from_zhoupu(
+        distance_km[is_vehicle], b_type[is_vehicle], traffic_factor, rng=rng
+    )
+
+    amount = rng.uniform(10_000, 1_000_000, n_records)
+    amount[is_vault] = rng.uniform(5_000_000, 20_000_000, n_vault)
+    n_counting = int(is_counting.sum())
+    amount[is_counting] = np.where(
+        rng.random(n_counting) < 0.3,
+        rng.uniform(1_000_000, 10_000_000, n_counting),
+        rng.uniform(10_000, 800_000, n_counting)
+    )
+
+    # 成本组件（批量内核，按业务类型掩码分支）
+    costs = calculate_batch_costs(b_type, region, distance_km, time_duration, amount, rng=rng)
+    time_duration[is_counting] = costs['processing_hours'][is_counting] * 60
+
+    # 日级冲击乘子应用（不破坏原逻辑：原 total_cost 仅乘场景 multiplier + time_weight；此处多一层 cost_multiplier_day 标记）
+    scenario_multiplier = 1.0
+    for sc in active_shocks:
+        scenario_multiplier *= SHOCK_SCENARIO_MULTIPLIERS.get(sc, 1.0)
+
+    time_weight = rng.choice(TIME_WEIGHTS, n_records, p=TIME_WEIGHT_PROBABILITIES)
+    base_total_cost = costs['vehicle_cost'] + costs['labor_cost'] + costs['equipment_cost']
+    total_cost = base_total_cost * scenario_multiplier * time_weight * cost_multiplier_day
+
+    return pd.DataFrame({
+        'start_time': start_time,
+        'business_type': b_type,
+        'region': region,
+        'distance_km': distance_km,
+        'time_duration': time_duration,
+        'amount': amount,
+        'vehicle_cost': costs['vehicle_cost'],
+        'labor_cost': costs['labor_cost'],
+        'equipment_cost': costs['equipment_cost'],
+        'over_distance_cost': costs['over_distance_cost'],
+        'standard_distance': costs['standard_distance'],
+        'over_distance': costs['over_distance'],
+        'base_total_cost': base_total_cost,
+        'scenario_multiplier': scenario_multiplier,
+        'time_weight': time_weight,
+        'cost_day_multiplier': cost_multiplier_day,
+        'total_cost': total_cost,
+        'shock_label': ','.join(active_shocks) if active_shocks else '正常',
+        'efficiency_ratio': rng.beta(3, 2, n_records)
+    })
+
+def label_simulated_anomalies(df_day, thresholds, rng):
+    """按给定分位阈值统一做异常判定与异常原因标注（原地添加列并返回）"""
+    df_day['is_anomaly'] = (
+        (df_day['total_cost'] > thresholds['total_cost']) |
+        (df_day['time_duration'] > thresholds['time_duration']) |
+        (df_day['distance_km'] > thresholds['distance_km']) |
+        (df_day['efficiency_ratio'] < 0.3)
+    )
+    df_day['anomaly_reason'] = assign_anomaly_reasons(df_day, thresholds, rng)
+    df_day['date'] = df_day['start_time'].dt.date
+    return df_day
+
+def _simulation_setup(start_date, days, daily_profile, shock_scenarios, seed):
+    if start_date is None:
+        start_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    if shock_scenarios is None:
+        shock_scenarios = DEFAULT_SHOCK_SCENARIOS
+    return start_date, max(1, int(days)), resolve_hour_probs(daily_profile), shock_scenarios, resolve_entropy(seed)
+
+def simulate_day_task(task):
+    """进程池任务：按（entropy, 天序号）重建当天随机流并模拟；给出阈值时同时完成异常标注"""
+    entropy, day_index, day_date, n_records, hour_probs, shock_scenarios, thresholds = task
+    data_rng, label_rng = day_random_generators(entropy, day_index)
+    day_frame = simulate_business_day(day_date, n_records, hour_probs, shock_scenarios, data_rng)
+    if thresholds is not None:
+        label_simulated_anomalies(day_frame, thresholds, label_rng)
+    return day_frame
+
+def sketch_day_task(task):
+    """进程池任务：模拟一天，仅返回异常阈值所需三列的分位数估计器（体积与记录数无关）"""
+    relative_accuracy = task[-1]
+    day_frame = simulate_day_task(task[:-1])
+    sketches = {}
+    for col in ['total_cost', 'time_duration', 'distance_km']:
+        sketches[col] = LogHistogramQuantileSketch(relative_accuracy)
+        sketches[col].update(day_frame[col].to_numpy())
+    return sketches
+
+def sketch_anomaly_thresholds(sketch_tasks, executor=None):
+    """逐天模拟并合并 sketch_day_task 的估计器，返回异常判定所需的三个分位阈值"""
+    sketches = None
+    for day_sketches in run_tasks(sketch_day_task, sketch_tasks, executor):
+        if sketches is None:
+            sketches = day_sketches
+        else:
+            for col, sketch in sketches.items():
+                sketch.merge(day_sketches[col])
+    return {
+        'total_cost': float(sketches['total_cost'].quantile(0.9)),
+        'time_duration': float(sketches['time_duration'].quantile(0.85)),
+        'distance_km': float(sketches['distance_km'].quantile(0.8))
+    }
+
+def estimate_configurable_anomaly_thresholds(
+    start_date: datetime = None,
+    days: int = 7,
+    daily_profile: list | None = None,
+    shock_scenarios: list | None = None,
+    seed: int | None = None,
+    base_records_per_day: int = 300,
+    relative_accuracy: float = 0.001,
+    workers: int = 1
+):
+    """只做 iter_configurable_business_data 的第一遍（分位数估计），返回异常阈值。
+
+    调用方可把结果记录下来并作为 anomaly_thresholds 传回流式生成器，便于落盘数据集复现。
+    """
+    start_date, days, hour_probs, shock_scenarios, entropy = _simulation_setup(
+        start_date, days, daily_profile, shock_scenarios, seed
+    )
+    tasks = [
+        (entropy, d, start_date + timedelta(days=d), base_records_per_day, hour_probs, shock_scenarios, None, relative_accuracy)
+        for d in range(days)
+    ]
+    with parallel_executor(workers) as executor:
+        return sketch_anomaly_thresholds(tasks, executor)
+
+def simulate_configurable_business_data(
+    start_date: datetime = None,
+    days: int = 7,
+    daily_profile: list | None = None,
+    shock_scenarios: list | None = None,
+    seed: int | None = None,
+    base_records_per_day: int = 300,
+    workers: int = 1
+):
+    """可配置业务数据模拟器（不改变原先 generate_sample_data 的逻辑，仅新增接口）。
+
+    参数:
+        start_date: 起始日期（日期部分有效，默认今天）
+        days: 模拟天数（建议 7-10）
+        daily_profile: 24长度的数组，表示每小时业务量权重；None 时复用既有 7-18 点权重逻辑
+        shock_scenarios: 列表，每个元素: {name, prob, multiplier, target_types(optional)}
+        seed: 随机种子，便于 A/B 测试（每天使用由 seed 派生的独立随机流）
+        base_records_per_day: 每天基础记录数（与 generate_sample_data 对齐默认为 300）
+        workers: 并行进程数；天与天的随机流相互独立，结果与进程数无关
+
+    返回:
+        DataFrame: 列包含
+            start_time, business_type, region, distance_km, time_duration, amount,
+            vehicle_cost, labor_cost, equipment_cost, over_distance_cost,
+            standard_distance, over_distance, total_cost(同原逻辑), shock_label,
+            is_anomaly, anomaly_reason
+
+    大规模（如全年、每天数万笔）请使用 iter_configurable_business_data 按天流式生成。
+    """
+    from transaction_schema import apply_transaction_schema
+
+    start_date, days, hour_probs, shock_scenarios, entropy = _simulation_setup(
+        start_date, days, daily_profile, shock_scenarios, seed
+    )
+
+    tasks = [
+        (entropy, d, start_date + timedelta(days=d), base_records_per_day, hour_probs, shock_scenarios, None)
+        for d in range(days)
+    ]
+    with parallel_executor(workers) as executor:
+        day_frames = run_tasks(simulate_day_task, tasks, executor)
+    df_sim = pd.concat(day_frames, ignore_index=True)
+    if df_sim.empty:
+        return df_sim
+
+    # 统一异常判断（保持风格）：根据分位+效率构造，阈值基于全部天数
+    thresholds = compute_anomaly_thresholds(df_sim)
+    for d, day_frame in enumerate(day_frames):
+        _, label_rng = day_random_generators(entropy, d)
+        label_simulated_anomalies(day_frame, thresholds, label_rng)
+    return apply_transaction_schema(pd.concat(day_frames, ignore_index=True))
+
+def iter_configurable_business_data(
+    start_date: datetime = None,
+    days: int = 7,
+    daily_profile: list | None = None,
+    shock_scenarios: list | None = None,
+    seed: int | None = None,
+    base_records_per_day: int = 300,
+    chunk_days: int = 1,
+    anomaly_thresholds: dict | None = None,
+    relative_accuracy: float = 0.001,
+    workers: int = 1
+):
+    """流式版 simulate_configurable_business_data：每次产出 chunk_days 天的 DataFrame，内存只与块大小有关。
+
+    异常判定的分位阈值:
+        anomaly_thresholds 给定时直接使用（单遍）；否则两遍生成——第一遍只把 total_cost /
+        time_duration / distance_km 送入 LogHistogramQuantileSketch 估计阈值（相对误差
+        ≤ relative_accuracy），第二遍按相同随机流重新生成并标注。每天的随机流只由 seed 与天序号
+        决定，因此在阈值相同的情况下，拼接结果与 simulate_configurable_business_data 逐行一致。
+
+    workers>1 时每个块内的天数分发到进程池并行生成（第一遍只回传估计器），结果与进程数无关。
+    """
+    from transaction_schema import apply_transaction_schema
+
+    start_date, days, hour_probs, shock_scenarios, entropy = _simulation_setup(
+        start_date, days, daily_profile, shock_scenarios, seed
+    )
+    chunk_days = max(1, int(chunk_days))
+
+    def day_task(d, thresholds):
+        return (entropy, d, start_date + timedelta(days=d), base_records_per_day, hour_probs, shock_scenarios, thresholds)
+
+    with parallel_executor(workers) as executor:
+        if anomaly_thresholds is None:
+            anomaly_thresholds = sketch_anomaly_thresholds(
+                [day_task(d, None) + (relative_accuracy,) for d in range(days)], executor
+            )
+
+        for chunk_start in range(0, days, chunk_days):
+            chunk_tasks = [day_task(d, anomaly_thresholds) for d in range(chunk_start, min(days, chunk_start + chunk_days))]
+            yield apply_transaction_schema(pd.concat(run_tasks(simulate_day_task, chunk_tasks, executor), ignore_index=True))
+
+# ==================== 历史数据模拟器 ====================
+
+def simulate_extended_history_day(task):
+    """进程池任务：生成倒数第 day 天的历史业务记录（整天一次性数组抽取）"""
+    entropy, day, days, end_date = task
+    rng = task_rng(entropy, day)
+
+    base_daily_cost = 15000
+    base_daily_business = 45
+    base_efficiency = 0.6
+    base_anomaly_rate = 0.08
+
+    date = end_date - timedelta(days=day)
+    day_of_week = date.weekday()
+    weekly_factor = 1.0 + 0.2 * np.sin(2 * np.pi * day_of_week / 7)
+    trend_factor = 1 + 0.001 * (days - day)
+    holiday_factor = 1.3 if day_of_week >= 5 else 1.0
+    random_factor = 1 + rng.normal(0, 0.05)
+
+    daily_cost = base_daily_cost * weekly_factor * trend_factor * holiday_factor * random_factor
+    daily_business_count = int(base_daily_business * weekly_factor * holiday_factor * random_factor)
+    daily_efficiency = base_efficiency * (1 + 0.1 * np.sin(2 * np.pi * day / 14)) * random_factor
+    daily_efficiency = max(0.3, min(0.9, daily_efficiency))
+    daily_anomaly_rate = base_anomaly_rate * (1 + 0.3 * rng.random()) * holiday_factor
+    daily_anomaly_rate = max(0.02, min(0.25, daily_anomaly_rate))
+
+    n = daily_business_count
+    business_type = np.array(BUSINESS_TYPES, dtype=object)[rng.choice(len(BUSINESS_TYPES), n, p=BUSINESS_PROBABILITIES)]
+    return pd.DataFrame({
+        'date': date.date(),
+        'business_type': business_type,
+        'total_cost': daily_cost / max(1, n) * rng.uniform(0.5, 1.5, n),
+        'efficiency_ratio': daily_efficiency * rng.uniform(0.8, 1.2, n),
+        'is_anomaly': rng.random(n) < daily_anomaly_rate,
+        'distance_km': rng.gamma(2, 8, n),
+        'time_duration': rng.gamma(3, 25, n),
+        'amount': np.where(business_type == '金库调拨', rng.uniform(8000000, 25000000, n), rng.uniform(50000, 2000000, n)),
+        'seasonal_factor': weekly_factor,
+        'trend_factor': trend_factor
+    })
+
+def simulate_extended_historical_data(days=60, end_date=None, seed=None, workers=1):
+    """生成最近 days 天的历史数据用于机器学习预测（每天独立随机流，可按天并行）"""
+    from transaction_schema import apply_transaction_schema
+
+    if end_date is None:
+        # 使用本地时间（已经是北京时间）
+        end_date = datetime.now()
+    entropy = resolve_entropy(seed)
+    tasks = [(entropy, day, days, end_date) for day in range(days)]
+    with parallel_executor(workers) as executor:
+        return apply_transaction_schema(pd.concat(run_tasks(simulate_extended_history_day, tasks, executor), ignore_index=True))
+
+HISTORICAL_EVENTS = {
+    '2019': {'covid_impact': 0, 'holiday_boost': 1.1, 'economic_growth': 1.05},
+    '2020': {'covid_impact': 0.7, 'holiday_boost': 0.9, 'economic_growth': 0.95},
+    '2021': {'covid_impact': 0.8, 'holiday_boost': 1.0, 'economic_growth': 1.02},
+    '2022': {'covid_impact': 0.9, 'holiday_boost': 1.05, 'economic_growth': 1.03},
+    '2023': {'covid_impact': 1.0, 'holiday_boost': 1.15, 'economic_growth': 1.08}
+}
+
+# 未单独配置的年份（用于更长的回测区间）按常态年份处理
+DEFAULT_HISTORICAL_EVENTS = {'covid_impact': 1.0, 'holiday_boost': 1.1, 'economic_growth': 1.05}
+
+# 年度成本乘子（疫情年份运营成本上升），未列出的年份为1.0
+HISTORICAL_COST_MULTIPLIERS = {2020: 1.3, 2021: 1.15}
+
+HOLIDAY_DAY_RANGES = {
+    '春节': [30, 35],
+    '清明': [95, 98],
+    '劳动节': [121, 125],
+    '端午': [160, 162],
+    '中秋': [258, 260],
+    '国庆': [274, 281]
+}
+
+def historical_year_calendar(year, rng):
+    """单年份的逐日日历因子数组（每年按第1-365天）：节假日、周内、季节与当日业务量"""
+    year_events = HISTORICAL_EVENTS.get(str(year), DEFAULT_HISTORICAL_EVENTS)
+    day_of_year = np.arange(1, 366)
+    dates = pd.Timestamp(year, 1, 1) + pd.to_timedelta(day_of_year - 1, unit='D')
+
+    is_holiday = np.zeros(len(day_of_year), dtype=bool)
+    for holiday_range in HOLIDAY_DAY_RANGES.values():
+        is_holiday |= (day_of_year >= holiday_range[0]) & (day_of_year <= holiday_range[1])
+    holiday_factor = np.where(is_holiday, year_events['holiday_boost'], 1.0)
+
+    weekly_factor = 1.0 + 0.2 * np.sin(2 * np.pi * dates.weekday.to_numpy() / 7)
+    seasonal_factor = 1.0 + 0.1 * np.sin(2 * np.pi * day_of_year / 365)
+
+    base_daily_business = 45
+    daily_business = (
+        base_daily_business *
+        year_events['covid_impact'] *
+        year_events['economic_growth'] *
+        holiday_factor *
+        weekly_factor *
+        seasonal_factor *
+        rng.uniform(0.8, 1.2, len(day_of_year))
+    ).astype(int)
+
+    return {
+        'date': dates.date,
+        'holiday_factor': holiday_factor,
+        'daily_business': np.maximum(1, daily_business),
+        'covid_impact': year_events['covid_impact'],
+        'economic_factor': year_events['economic_growth']
+    }
+
+def simulate_historical_year(task):
+    """进程池任务：列式生成单个年份的历史业务记录（逐日因子按当日笔数 np.repeat 展开后整列抽取）"""
+    entropy, year = task
+    rng = task_rng(entropy, year)
+    calendar = historical_year_calendar(year, rng)
+
+    day_index = np.repeat(np.arange(len(calendar['daily_business'])), calendar['daily_business'])
+    n = len(day_index)
+    holiday_factor = calendar['holiday_factor'][day_index]
+    covid_factor = calendar['covid_impact']
+    is_2020 = year == 2020
+
+    business_type = np.array(BUSINESS_TYPES, dtype=object)[rng.choice(len(BUSINESS_TYPES), n, p=BUSINESS_PROBABILITIES)]
+    final_cost = rng.gamma(2, 150, n) * HISTORICAL_COST_MULTIPLIERS.get(year, 1.0) * holiday_factor
+
+    return pd.DataFrame({
+        'date': calendar['date'][day_index],
+        'year': year,
+        'business_type': business_type,
+        'total_cost': final_cost,
+        'efficiency_ratio': rng.beta(3, 2, n) * covid_factor,
+        'is_anomaly': rng.random(n) < (0.15 if is_2020 else 0.05),
+        'distance_km': rng.gamma(2, 8, n),
+        'time_duration': rng.gamma(3, 25, n) * (1.2 if is_2020 else 1.0),
+        'amount': rng.uniform(50000, 2000000, n),
+        'covid_impact': covid_factor,
+        'holiday_factor': holiday_factor,
+        'economic_factor': calendar['economic_factor']
+    })
+
+def simulate_realistic_historical_data(start_year=2019, end_year=2023, seed=None, workers=1):
+    """生成 start_year-end_year 年（含两端）的真实历史数据模拟
+
+    每个年份使用由 (seed, 年份) 派生的独立随机流：同一 seed 下某一年的数据与所选区间、
+    进程数均无关；年份按任务分发到进程池。
+    """
+    from transaction_schema import apply_transaction_schema
+
+    entropy = resolve_entropy(seed)
+    tasks = [(entropy, year) for year in range(int(start_year), int(end_year) + 1)]
+    with parallel_executor(workers) as executor:
+        return apply_transaction_schema(pd.concat(run_tasks(simulate_historical_year, tasks, executor), ignore_index=True))
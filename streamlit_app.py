@@ -5,8 +5,45 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import datetime, timedelta, timezone
+import os
 import time
 from sklearn.ensemble import RandomForestRegressor
+from cost_engine import (
+    get_shanghai_area_classification,
+    get_area_type,
+    get_pudong_zhoupu_to_districts_distance,
+    get_shanghai_area_classification_from_zhoupu,
+    get_area_type_from_zhoupu,
+    calculate_cash_counting_cost,
+    calculate_vehicle_cost,
+    calculate_vault_transfer_cost,
+    calculate_realistic_time_duration_from_zhoupu,
+    calculate_over_distance_cost,
+    generate_sample_columns_parallel,
+    assign_anomaly_reasons,
+    sample_business_timestamps,
+    simulate_configurable_business_data,
+    simulate_extended_historical_data,
+    simulate_realistic_historical_data,
+    task_rng
+)
+from transaction_schema import apply_transaction_schema
+from allocation_engine import optimize_cost_allocation, optimize_segment_allocations
+from forecast_engine import (
+    HW_SEASON_LENGTH,
+    ForecastModelCache,
+    clip_metric_values,
+    fit_holt_winters,
+    forecast_cache_key,
+    holt_winters_forecast,
+    multi_output_forecast
+)
+from montecarlo_engine import (
+    TURNOVER_DEFAULT_PARAMS,
+    simulate_turnover_scenarios,
+    submit_monte_carlo_job,
+    turnover_scenario_grid
+)
 
 # 页面配置
 st.set_page_config(
@@ -79,7 +116,7 @@ class RealDataConnector:
         print("   3. 替换 load_real_anomaly_rules() 方法加载异常检测规则")
         
     def load_real_data(self):
-        """真实数据加载接口"""
+        """真实数据加载接口（返回的明细表请经 apply_transaction_schema 统一为紧凑内存模式）"""
         print("⚠️  当前使用模拟数据，请在 load_real_data() 方法中接入真实数据源")
         return None
     
@@ -93,361 +130,28 @@ class RealDataConnector:
         print("⚠️  当前使用默认异常检测规则，请在 load_real_anomaly_rules() 方法中接入真实规则")
         return None
 
-# ==================== 地理与距离相关函数 ====================
-
-def get_shanghai_area_classification():
-    """上海区域分类：市区、近郊、远郊"""
-    return {
-        # 市区（网点密集，标准公里数较少）
-        '市区': {
-            'regions': ['黄浦区', '徐汇区', '长宁区', '静安区', '普陀区', '虹口区', '杨浦区'],
-            'standard_km': {
-                '金库运送': 8,     # 市区金库运送标准8公里
-                '上门收款': 10,    # 市区上门收款标准10公里
-                '现金清点': 0      # 现金清点无距离费用
-            }
-        },
-        # 近郊（网点适中，标准公里数适中）
-        '近郊': {
-            'regions': ['闵行区', '宝山区', '嘉定区', '浦东新区'],
-            'standard_km': {
-                '金库运送': 30,    # 近郊金库运送标准30公里
-                '上门收款': 35,    # 近郊上门收款标准35公里
-                '现金清点': 0      # 现金清点无距离费用
-            }
-        },
-        # 远郊（网点稀少，标准公里数较多）
-        '远郊': {
-            'regions': ['金山区', '松江区', '青浦区', '奉贤区', '崇明区'],
-            'standard_km': {
-                '金库运送': 45,    # 远郊金库运送标准45公里
-                '上门收款': 50,    # 远郊上门收款标准50公里
-                '现金清点': 0      # 现金清点无距离费用
-            }
-        }
-    }
-
-def get_area_type(region):
-    """根据区域获取地区类型"""
-    area_classification = get_shanghai_area_classification()
-    for area_type, config in area_classification.items():
-        if region in config['regions']:
-            return area_type
-    return '近郊'  # 默认返回近郊
-
-def get_pudong_zhoupu_to_districts_distance():
-    """浦东新区周浦镇到上海各区的实际距离（公里）- 重新核实修正版"""
-    return {
-        # 市区 - 周浦位于浦东外环外，到市区距离较远
-        '黄浦区': 28,      # 周浦→外滩约28km
-        '徐汇区': 32,      # 周浦→徐家汇约32km  
-        '长宁区': 38,      # 周浦→中山公园约38km
-        '静安区': 30,      # 周浦→静安寺约30km
-        '普陀区': 42,      # 周浦→真如约42km
-        '虹口区': 35,      # 周浦→四川北路约35km
-        '杨浦区': 33,      # 周浦→五角场约33km
-        
-        # 近郊 - 周浦到邻近区域
-        '闵行区': 25,      # 周浦→莘庄约25km（相对较近）
-        '宝山区': 50,      # 周浦→宝山约50km（需跨越市区）
-        '嘉定区': 55,      # 周浦→嘉定约55km（距离较远）
-        '浦东新区': 20,    # 周浦→陆家嘴约15km
-        
-        # 远郊 - 周浦到远郊区域（重新核实）
-        '金山区': 60,      # 周浦→金山石化约60km（经G1501外环高速）
-        '松江区': 48,      # 周浦→松江新城约48km（经S32或G60高速）
-        '青浦区': 55,      # 周浦→青浦约55km（经S32高速）
-        '奉贤区': 28,      # 周浦→奉贤约28km（都在南部，较近）
-        '崇明区': 70       # 周浦→崇明约70km（含过隧道时间）
-    }
-
-def get_shanghai_area_classification_from_zhoupu():
-    """上海区域分类：从周浦出发的标准距离（基于修正距离重新分类）"""
-    return {
-        # 近距离区域（≤30km）
-        '近距离': {
-            'regions': ['浦东新区', '闵行区', '奉贤区', '黄浦区', '静安区'],
-            'standard_km': {
-                '金库运送': 25,    # 近距离标准25公里
-                '上门收款': 28,    # 近距离上门收款标准28公里
-                '现金清点': 0      # 现金清点无距离费用
-            }
-        },
-        # 中距离区域（30-40km）
-        '中距离': {
-            'regions': ['徐汇区', '杨浦区', '虹口区', '长宁区'],
-            'standard_km': {
-                '金库运送': 35,    # 中距离标准35公里
-                '上门收款': 38,    # 中距离上门收款标准38公里
-                '现金清点': 0      # 现金清点无距离费用
-            }
-        },
-        # 远距离区域（≥40km）
-        '远距离': {
-            'regions': ['普陀区', '松江区', '宝山区', '嘉定区', '青浦区', '金山区', '崇明区'],
-            'standard_km': {
-                '金库运送': 50,    # 远距离标准50公里
-                '上门收款': 55,    # 远距离上门收款标准55公里
-                '现金清点': 0      # 现金清点无距离费用
-            }
-        }
-    }
-
-def get_area_type_from_zhoupu(region):
-    """根据区域获取地区类型（基于周浦出发）"""
-    area_classification = get_shanghai_area_classification_from_zhoupu()
-    for area_type, config in area_classification.items():
-        if region in config['regions']:
-            return area_type
-    return '中距离'  # 默认返回中距离
-
-# ==================== 成本计算相关函数 ====================
-
-def calculate_cash_counting_cost(amount):
-    """现金清点成本计算函数"""
-    # 设定大笔清点阈值（100万以上为大笔）
-    large_amount_threshold = 1000000
-    
-    if amount >= large_amount_threshold:
-        # 大笔清点：2个人 + 机器
-        monthly_labor_cost = 15000 * 2
-        machine_cost = 2000000 / (30 * 12)  # 每月折旧成本
-        monthly_total_cost = monthly_labor_cost + machine_cost
-        
-        hourly_cost = monthly_total_cost / (22 * 8)
-        processing_hours = np.random.uniform(2, 4)
-        total_cost = hourly_cost * processing_hours
-        
-        return {
-            'total_cost': total_cost,
-            'labor_cost': (monthly_labor_cost / (22 * 8)) * processing_hours,
-            'equipment_cost': (machine_cost / (22 * 8)) * processing_hours,
-            'time_duration': processing_hours * 60,  # 转换为分钟
-            'counting_type': '大笔清点',
-            'staff_count': 2,
-            'has_machine': True,
-            'processing_hours': processing_hours
-        }
-    else:
-        # 小笔清点：8个人手工清点
-        avg_salary = np.random.uniform(7000, 8000)
-        monthly_labor_cost = avg_salary * 8
-        monthly_total_cost = monthly_labor_cost
-        
-        hourly_cost = monthly_total_cost / (22 * 8)
-        processing_hours = np.random.uniform(1, 3)
-        total_cost = hourly_cost * processing_hours
-        
-        return {
-            'total_cost': total_cost,
-            'labor_cost': total_cost,  # 小笔清点全部为人工成本
-            'equipment_cost': 0,       # 无设备成本
-            'time_duration': processing_hours * 60,  # 转换为分钟
-            'counting_type': '小笔清点',
-            'staff_count': 8,
-            'has_machine': False,
-            'processing_hours': processing_hours
-        }
-
-def calculate_vehicle_cost(distance_km, time_hours, region):
-    """统一运钞车成本计算函数"""
-    hourly_cost = 75000 / 30 / 8  # 312.5元/小时
-    basic_cost = time_hours * hourly_cost
-
-    area_type = get_area_type(region)
-    area_classification = get_shanghai_area_classification()
-    standard_distance = area_classification[area_type]['standard_km'].get('金库运送', 15)
-    standard_time = distance_km * 0.08 + 0.5
-
-    overtime_hours = max(0, time_hours - standard_time)
-    overtime_cost = overtime_hours * 300
-    over_km = max(0, distance_km - standard_distance)
-    over_km_cost = over_km * 12
-
-    return basic_cost + overtime_cost + over_km_cost, {
-        'basic_cost': basic_cost,
-        'overtime_cost': overtime_cost,
-        'over_km_cost': over_km_cost,
-        'standard_distance': standard_distance,
-        'area_type': area_type
-    }
-
-def calculate_vault_transfer_cost():
-    """金库调拨专用成本计算函数"""
-    hourly_cost = 75000 / 30 / 8
-    
-    base_minutes = np.random.uniform(35, 50)  # 35-50分钟（合理范围）
-    base_hours = base_minutes / 60
-    
-    overtime_minutes = np.random.uniform(10, 25) if np.random.random() < 0.15 else 0  # 15%概率超时
-    overtime_hours = overtime_minutes / 60
-    
-    over_km = np.random.uniform(0.5, 2) if np.random.random() < 0.05 else 0  # 5%概率超公里
-    
-    basic_cost = base_hours * hourly_cost
-    overtime_cost = overtime_hours * 300
-    over_km_cost = over_km * 12
-    total_vehicle_cost = basic_cost + overtime_cost + over_km_cost
-    total_time = base_minutes + overtime_minutes
-    
-    return {
-        'vehicle_cost': total_vehicle_cost,
-        'time_duration': total_time,
-        'basic_cost': basic_cost,
-        'overtime_cost': overtime_cost,
-        'over_km_cost': over_km_cost,
-        'distance_km': 15.0,
-        'standard_distance': 15,
-        'area_type': '专线',
-        'amount': np.random.uniform(5000000, 20000000)
-    }
-
-def calculate_realistic_time_duration_from_zhoupu(distance_km, business_type, traffic_factor=1.0):
-    """基于实际距离计算真实配送时间（从周浦出发）"""
-    if distance_km <= 30:  # 近距离
-        avg_speed = 35  # km/h，周浦到邻近区域
-    elif distance_km <= 45:  # 中距离
-        avg_speed = 32  # km/h，市区段较多，拥堵
-    else:  # 远距离（如松江、青浦等）
-        avg_speed = 45  # km/h，主要走高速公路
-    
-    base_driving_time = distance_km / avg_speed * 60  # 分钟
-    
-    operation_time = {
-        '金库运送': np.random.uniform(20, 40),
-        '上门收款': np.random.uniform(25, 50),
-        '金库调拨': np.random.uniform(35, 70),
-        '现金清点': np.random.uniform(80, 280)
-    }.get(business_type, 25)
-    
-    if distance_km > 45:  # 到远郊
-        traffic_delay = np.random.uniform(10, 20)
-    elif distance_km > 30:  # 到市区
-        traffic_delay = np.random.uniform(15, 25)
-    else:  # 近距离
-        traffic_delay = np.random.uniform(8, 15)
-    
-    total_time = (base_driving_time + operation_time + traffic_delay) * traffic_factor
-    variation = np.random.uniform(0.92, 1.08)
-    final_time = total_time * variation
-    
-    return max(25, final_time)
-
-def calculate_over_distance_cost(actual_distance, standard_distance, business_type):
-    """计算超距离成本（基于周浦的距离标准）"""
-    over_distance = max(0, actual_distance - standard_distance)
-    
-    over_distance_rate = {
-        '金库运送': 12,
-        '上门收款': 12,
-        '金库调拨': 12,
-        '现金清点': 0
-    }.get(business_type, 15)
-    
-    over_distance_cost = over_distance * over_distance_rate
-    
-    return {
-        'over_distance': over_distance,
-        'over_distance_cost': over_distance_cost,
-        'actual_distance': actual_distance,
-        'standard_distance': standard_distance
-    }
+# 地理距离与成本计算函数见 cost_engine.py
 
 # ==================== 数据生成相关函数 ====================
 
 @st.cache_data(ttl=60)
 def generate_business_hours_timestamps(n_records):
     """生成符合业务时间规律的时间戳，主要在7-18点，早上和下午业务量更多"""
-    timestamps = []
-    # 使用本地时间（已经是北京时间）
+    # 使用本地时间（已经是北京时间），覆盖最近3天，按时间排序
     base_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    # 定义每小时的业务权重（7-18点）
-    hour_weights = {
-        7: 0.15,   # 早上开始，业务量较多
-        8: 0.20,   # 上班高峰，业务量多
-        9: 0.18,   # 上午忙碌时段
-        10: 0.12,  # 上午正常时段
-        11: 0.10,  # 上午后期
-        12: 0.05,  # 午休时间，业务量少
-        13: 0.08,  # 下午开始
-        14: 0.15,  # 下午忙碌时段，业务量较多
-        15: 0.18,  # 下午高峰，业务量多
-        16: 0.16,  # 下午忙碌时段
-        17: 0.12,  # 下班前，业务量较多
-        18: 0.08   # 下班时间，业务量减少
-    }
-    
-    # 归一化权重
-    total_weight = sum(hour_weights.values())
-    normalized_weights = {hour: weight/total_weight for hour, weight in hour_weights.items()}
-    
-    # 根据权重分配生成时间戳
-    for i in range(n_records):
-        # 随机选择小时（7-18点）
-        hour = int(np.random.choice(
-            list(normalized_weights.keys()), 
-            p=list(normalized_weights.values())
-        ))
-        
-        # 在该小时内随机选择分钟
-        minute = int(np.random.randint(0, 60))
-        second = int(np.random.randint(0, 60))
-        
-        # 随机选择最近几天
-        days_ago = int(np.random.randint(0, 3))  # 最近3天
-        
-        timestamp = base_date - timedelta(days=days_ago) + timedelta(hours=hour, minutes=minute, seconds=second)
-        timestamps.append(timestamp)
-    
-    # 按时间排序
-    timestamps.sort()
-    return timestamps
+    return sample_business_timestamps(n_records, base_date - timedelta(days=2), days=3, sort=True)
 
 def generate_business_hour_for_date(target_date):
     """为指定日期生成一个业务时间"""
-    # 定义每小时的业务权重（7-18点）
-    hour_weights = {
-        7: 0.15,   # 早上开始，业务量较多
-        8: 0.20,   # 上班高峰，业务量多
-        9: 0.18,   # 上午忙碌时段
-        10: 0.12,  # 上午正常时段
-        11: 0.10,  # 上午后期
-        12: 0.05,  # 午休时间，业务量少
-        13: 0.08,  # 下午开始
-        14: 0.15,  # 下午忙碌时段，业务量较多
-        15: 0.18,  # 下午高峰，业务量多
-        16: 0.16,  # 下午忙碌时段
-        17: 0.12,  # 下班前，业务量较多
-        18: 0.08   # 下班时间，业务量减少
-    }
-    
-    # 归一化权重
-    total_weight = sum(hour_weights.values())
-    normalized_weights = {hour: weight/total_weight for hour, weight in hour_weights.items()}
-    
-    # 随机选择小时（7-18点）
-    hour = int(np.random.choice(
-        list(normalized_weights.keys()), 
-        p=list(normalized_weights.values())
-    ))
-    
-    # 在该小时内随机选择分钟
-    minute = int(np.random.randint(0, 60))
-    second = int(np.random.randint(0, 60))
-    
-    return target_date.replace(hour=hour, minute=minute, second=second)
-
-def generate_sample_data():
-    """生成基于周浦真实距离的示例数据"""
-    np.random.seed(int(time.time()) // 60)
+    return pd.Timestamp(sample_business_timestamps(1, target_date)[0]).to_pydatetime()
 
+def generate_sample_data_rowwise(n_records=300):
+    """逐行生成示例数据的业务与成本列（原实现，保留用于对照校验）"""
     business_types = ['金库运送', '上门收款', '金库调拨', '现金清点']
     business_probabilities = [0.45, 0.20, 0.0625, 0.2875]
     
     distance_data = get_pudong_zhoupu_to_districts_distance()
     regions = list(distance_data.keys())
-    n_records = 300
 
     # 生成业务类型和区域
     business_type_list = np.random.choice(business_types, n_records, p=business_probabilities)
@@ -595,6 +299,34 @@ def generate_sample_data():
     df['counting_type'] = [detail.get('counting_type', '') for detail in counting_details]
     df['staff_count'] = [detail.get('staff_count', 0) for detail in counting_details]
     df['has_machine'] = [detail.get('has_machine', False) for detail in counting_details]
+    return df
+
+def generate_sample_data(n_records=300, engine='columnar', seed=None, workers=1):
+    """生成基于周浦真实距离的示例数据
+
+    参数:
+        n_records: 记录条数（默认300）
+        engine: 'columnar' 整列数组生成；'rowwise' 原逐行生成
+        seed: 随机种子（默认按分钟取整的当前时间，1分钟内结果稳定）
+        workers: 列式引擎的并行进程数（分块使用独立随机流，结果与进程数无关）
+    """
+    if seed is None:
+        seed = int(time.time()) // 60
+
+    if engine == 'rowwise':
+        np.random.seed(seed)
+        rng = np.random
+        df = generate_sample_data_rowwise(n_records)
+    else:
+        rng = task_rng(seed, 1)
+        df = generate_sample_columns_parallel(n_records, seed=seed, workers=workers)
+        # 使用本地时间（已经是北京时间），覆盖最近3天，按时间排序
+        base_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        df.insert(
+            df.columns.get_loc('is_anomaly'),
+            'start_time',
+            sample_business_timestamps(n_records, base_date - timedelta(days=2), days=3, rng=rng, sort=True)
+        )
     
     # 成本计算
     df['scenario_multiplier'] = df['market_scenario'].map({
@@ -608,169 +340,38 @@ def generate_sample_data():
     ) * df['scenario_multiplier'] * df['time_weight']
     df['cost_per_km'] = df['total_cost'] / df['distance_km']
     
-    # 生成异常原因（在成本计算完成后）
-    anomaly_reasons = []
-    for i in range(n_records):
-        if df.loc[i, 'is_anomaly']:
-            # 根据业务特征生成合理的异常原因
-            if df.loc[i, 'total_cost'] > df['total_cost'].quantile(0.9):
-                reasons = ['设备故障延误', '路线拥堵严重', '人员配置不足', '紧急调度变更']
-            elif df.loc[i, 'time_duration'] > df['time_duration'].quantile(0.85):
-                reasons = ['操作流程复杂', '等待时间过长', '交接手续繁琐', '安全检查延时']
-            elif df.loc[i, 'distance_km'] > df['distance_km'].quantile(0.8):
-                reasons = ['最优路线受阻', '临时改道', 'GPS导航偏差', '交通管制影响']
-            elif df.loc[i, 'efficiency_ratio'] < 0.3:
-                reasons = ['人员操作失误', '系统响应缓慢', '协调配合问题', '应急预案启动']
-            else:
-                reasons = ['天气因素影响', '客户特殊要求', '监管部门检查', '突发安全事件']
-            anomaly_reasons.append(np.random.choice(reasons))
-        else:
-            anomaly_reasons.append('正常')
-    
-    df['anomaly_reason'] = anomaly_reasons
+    # 生成异常原因（在成本计算完成后，分位阈值整表只算一次）
+    df['anomaly_reason'] = assign_anomaly_reasons(df, rng=rng)
     
     # 添加日期列（从start_time提取）
     df['date'] = df['start_time'].dt.date
 
-    return df
+    return apply_transaction_schema(df)
 
 @st.cache_data(ttl=300)
 def generate_extended_historical_data(days=60):
     """生成更真实的历史数据用于机器学习预测"""
-    all_data = []
-    business_types = ['金库运送', '上门收款', '金库调拨', '现金清点']
-    business_probabilities = [0.45, 0.20, 0.0625, 0.2875]
-    
-    base_daily_cost = 15000
-    base_daily_business = 45
-    base_efficiency = 0.6
-    base_anomaly_rate = 0.08
-    
-    for day in range(days):
-        # 使用本地时间（已经是北京时间）
-        date = datetime.now() - timedelta(days=day)
-        
-        day_of_week = date.weekday()
-        weekly_factor = 1.0 + 0.2 * np.sin(2 * np.pi * day_of_week / 7)
-        trend_factor = 1 + 0.001 * (days - day)
-        holiday_factor = 1.3 if day_of_week >= 5 else 1.0
-        random_factor = 1 + np.random.normal(0, 0.05)
-        
-        daily_cost = base_daily_cost * weekly_factor * trend_factor * holiday_factor * random_factor
-        daily_business_count = int(base_daily_business * weekly_factor * holiday_factor * random_factor)
-        daily_efficiency = base_efficiency * (1 + 0.1 * np.sin(2 * np.pi * day / 14)) * random_factor
-        daily_efficiency = max(0.3, min(0.9, daily_efficiency))
-        daily_anomaly_rate = base_anomaly_rate * (1 + 0.3 * np.random.random()) * holiday_factor
-        daily_anomaly_rate = max(0.02, min(0.25, daily_anomaly_rate))
-        
-        for _ in range(daily_business_count):
-            business_type = np.random.choice(business_types, p=business_probabilities)
-            
-            record = {
-                'date': date.date(),
-                'business_type': business_type,
-                'total_cost': daily_cost / daily_business_count * np.random.uniform(0.5, 1.5),
-                'efficiency_ratio': daily_efficiency * np.random.uniform(0.8, 1.2),
-                'is_anomaly': np.random.random() < daily_anomaly_rate,
-                'distance_km': np.random.gamma(2, 8),
-                'time_duration': np.random.gamma(3, 25),
-                'amount': np.random.uniform(50000, 2000000) if business_type != '金库调拨' else np.random.uniform(8000000, 25000000),
-                'seasonal_factor': weekly_factor,
-                'trend_factor': trend_factor
-            }
-            all_data.append(record)
-    
-    return pd.DataFrame(all_data)
+    return simulate_extended_historical_data(days)
 
 @st.cache_data(ttl=600)
 def generate_realistic_historical_data():
     """生成2019-2023年真实历史数据模拟"""
-    historical_events = {
-        '2019': {'covid_impact': 0, 'holiday_boost': 1.1, 'economic_growth': 1.05},
-        '2020': {'covid_impact': 0.7, 'holiday_boost': 0.9, 'economic_growth': 0.95},
-        '2021': {'covid_impact': 0.8, 'holiday_boost': 1.0, 'economic_growth': 1.02},
-        '2022': {'covid_impact': 0.9, 'holiday_boost': 1.05, 'economic_growth': 1.03},
-        '2023': {'covid_impact': 1.0, 'holiday_boost': 1.15, 'economic_growth': 1.08}
-    }
-    
-    holidays = {
-        '春节': [30, 35],
-        '清明': [95, 98],
-        '劳动节': [121, 125],
-        '端午': [160, 162],
-        '中秋': [258, 260],
-        '国庆': [274, 281]
-    }
-    
-    all_historical_data = []
-    
-    for year in range(2019, 2024):
-        year_events = historical_events[str(year)]
-        
-        for day_of_year in range(1, 366):
-            try:
-                date = datetime(year, 1, 1) + timedelta(days=day_of_year-1)
-            except:
-                continue
-                
-            base_daily_business = 45
-            covid_factor = year_events['covid_impact']
-            economic_factor = year_events['economic_growth']
-            
-            holiday_factor = 1.0
-            for holiday_name, holiday_range in holidays.items():
-                if holiday_range[0] <= day_of_year <= holiday_range[1]:
-                    holiday_factor = year_events['holiday_boost']
-                    break
-            
-            weekly_factor = 1.0 + 0.2 * np.sin(2 * np.pi * date.weekday() / 7)
-            seasonal_factor = 1.0 + 0.1 * np.sin(2 * np.pi * day_of_year / 365)
-            
-            daily_business = int(
-                base_daily_business * 
-                covid_factor * 
-                economic_factor * 
-                holiday_factor * 
-                weekly_factor * 
-                seasonal_factor * 
-                np.random.uniform(0.8, 1.2)
-            )
-            
-            for _ in range(max(1, daily_business)):
-                business_types = ['金库运送', '上门收款', '金库调拨', '现金清点']
-                business_type = np.random.choice(business_types, p=[0.45, 0.20, 0.0625, 0.2875])
-                
-                base_cost = np.random.gamma(2, 150)
-                
-                if year == 2020:
-                    cost_multiplier = 1.3
-                elif year == 2021:
-                    cost_multiplier = 1.15
-                else:
-                    cost_multiplier = 1.0
-                    
-                final_cost = base_cost * cost_multiplier * holiday_factor
-                
-                record = {
-                    'date': date.date(),
-                    'year': year,
-                    'business_type': business_type,
-                    'total_cost': final_cost,
-                    'efficiency_ratio': np.random.beta(3, 2) * covid_factor,
-                    'is_anomaly': np.random.choice([True, False], p=[0.05 if year != 2020 else 0.15, 0.95 if year != 2020 else 0.85]),
-                    'distance_km': np.random.gamma(2, 8),
-                    'time_duration': np.random.gamma(3, 25) * (1.2 if year == 2020 else 1.0),
-                    'amount': np.random.uniform(50000, 2000000),
-                    'covid_impact': covid_factor,
-                    'holiday_factor': holiday_factor,
-                    'economic_factor': economic_factor
-                }
-                all_historical_data.append(record)
-    
-    return pd.DataFrame(all_historical_data)
+    return simulate_realistic_historical_data()
 
 # ==================== 成本优化分析函数 ====================
 
+@st.cache_data(ttl=600, show_spinner=False)
+def optimize_cost_allocations(df):
+    """成本分摊优化（整体与分段）：按数据缓存，页面其他交互引起的重跑不会重新求解"""
+    opt_res = optimize_cost_allocation(
+        df, objective='min_cost_with_anomaly_penalty', anomaly_penalty=0.25, solver='stats'
+    )
+    # 分段（业务类型×区域×地区类型）独立优化的权重表
+    segment_weights = optimize_segment_allocations(
+        df, objective='min_cost_with_anomaly_penalty', anomaly_penalty=0.25
+    )
+    return opt_res.get('best_weights_normalized', {}), opt_res.get('improvement_pct', 0), segment_weights
+
 def analyze_cost_optimization(df):
     """成本分摊优化分析"""
     optimization_data = {
@@ -786,428 +387,53 @@ def analyze_cost_optimization(df):
     }
     # 使用新增优化引擎（不改变原 total_cost，仅提供参考）
     try:
-        opt_res = optimize_cost_allocation(df, objective='min_cost_with_anomaly_penalty', anomaly_penalty=0.25)
-        optimization_data['optimized_weights'] = opt_res.get('best_weights_normalized', {})
-        optimization_data['optimized_improvement_pct'] = opt_res.get('improvement_pct', 0)
+        (
+            optimization_data['optimized_weights'],
+            optimization_data['optimized_improvement_pct'],
+            optimization_data['segment_weights']
+        ) = optimize_cost_allocations(df)
     except Exception:
         pass
     return optimization_data
 
 # ==================== 新增：可配置数据模拟器与分摊优化引擎 ====================
 
-def simulate_configurable_business_data(
-    start_date: datetime = None,
-    days: int = 7,
-    daily_profile: list | None = None,
-    shock_scenarios: list | None = None,
-    seed: int | None = None,
-    base_records_per_day: int = 300
-):
-    """可配置业务数据模拟器（不改变原先 generate_sample_data 的逻辑，仅新增接口）。
+# 成本分摊优化引擎 optimize_cost_allocation 见 allocation_engine.py
 
-    参数:
-        start_date: 起始日期（日期部分有效，默认今天）
-        days: 模拟天数（建议 7-10）
-        daily_profile: 24长度的数组，表示每小时业务量权重；None 时复用既有 7-18 点权重逻辑
-        shock_scenarios: 列表，每个元素: {name, prob, multiplier, target_types(optional)}
-        seed: 随机种子，便于 A/B 测试
-        base_records_per_day: 每天基础记录数（与 generate_sample_data 对齐默认为 300）
-
-    返回:
-        DataFrame: 列包含
-            start_time, business_type, region, distance_km, time_duration, amount,
-            vehicle_cost, labor_cost, equipment_cost, over_distance_cost,
-            standard_distance, over_distance, total_cost(同原逻辑), shock_label,
-            is_anomaly, anomaly_reason
-    """
-    if seed is not None:
-        np.random.seed(seed)
-    if start_date is None:
-        start_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    days = max(1, int(days))
+# 后台蒙特卡洛任务的进度刷新间隔（秒）
+MC_POLL_SECONDS = 0.5
 
-    # 业务类型与概率（保持与原函数一致）
-    business_types = ['金库运送', '上门收款', '金库调拨', '现金清点']
-    business_probabilities = [0.45, 0.20, 0.0625, 0.2875]
+@st.cache_resource(ttl=600, show_spinner=False)
+def run_monte_carlo_optimization(iterations=100000, mean_tolerance=None, p95_tolerance=None, sampling='random'):
+    """提交10万次蒙特卡洛模拟优化分析到后台线程，返回任务句柄（引擎见 montecarlo_engine.py）
 
-    # 默认小时权重（复用原 7-18 逻辑），其他小时设极低权重
-    default_hour_weights = {h: 0.01 for h in range(24)}
-    default_hour_weights.update({
-        7:0.15,8:0.20,9:0.18,10:0.12,11:0.10,12:0.05,13:0.08,14:0.15,15:0.18,16:0.16,17:0.12,18:0.08
-    })
-    if daily_profile is not None and len(daily_profile) == 24:
-        hour_probs = np.array(daily_profile, dtype=float)
-        hour_probs = hour_probs / hour_probs.sum()
-    else:
-        # 使用默认映射
-        hour_probs = np.array([default_hour_weights[h] for h in range(24)])
-        hour_probs = hour_probs / hour_probs.sum()
-
-    # 冲击场景配置
-    if shock_scenarios is None:
-        shock_scenarios = [
-            {'name': '高需求期', 'prob': 0.12, 'multiplier': 1.10, 'target_types': None},
-            {'name': '紧急状况', 'prob': 0.05, 'multiplier': 1.45, 'target_types': None},
-            {'name': '节假日', 'prob': 0.08, 'multiplier': 1.50, 'target_types': None}
-        ]
-
-    distance_map = get_pudong_zhoupu_to_districts_distance()
-    regions = list(distance_map.keys())
-
-    records = []
-    for d in range(days):
-        day_date = start_date + timedelta(days=d)
-        # 根据冲击 / 节假日等决定当天是否套用场景（允许多个场景叠加）
-        active_shocks = []
-        cost_multiplier_day = 1.0
-        for sc in shock_scenarios:
-            if np.random.random() < sc.get('prob', 0):
-                active_shocks.append(sc['name'])
-                cost_multiplier_day *= sc.get('multiplier', 1.0)
-
-        n_records_today = base_records_per_day
-        for i in range(n_records_today):
-            # 小时选择
-            hour = np.random.choice(range(24), p=hour_probs)
-            minute = np.random.randint(0, 60)
-            second = np.random.randint(0, 60)
-            ts = day_date.replace(hour=int(hour), minute=int(minute), second=int(second))
-
-            b_type = np.random.choice(business_types, p=business_probabilities)
-            if b_type == '金库调拨':
-                region = '浦东新区'
-                distance_km = 15.0
-            else:
-                region = np.random.choice(regions)
-                distance_km = distance_map[region] * np.random.uniform(0.9, 1.1)
-
-            # 时间 / 距离逻辑复用
-            if b_type == '金库调拨':
-                base_minutes = np.random.uniform(35, 50)
-                overtime_minutes = np.random.uniform(10, 25) if np.random.random() < 0.15 else 0
-                time_duration = base_minutes + overtime_minutes
-            elif b_type == '现金清点':
-                # 清点时间来自金额规模
-                if np.random.random() < 0.3:
-                    amount_large = True
-                    amount = np.random.uniform(1_000_000, 10_000_000)
-                else:
-                    amount_large = False
-                    amount = np.random.uniform(10_000, 800_000)
-                counting_res = calculate_cash_counting_cost(amount)
-                time_duration = counting_res['time_duration']
-            else:
-                traffic_factor = np.random.uniform(0.85, 1.35)
-                time_duration = calculate_realistic_time_duration_from_zhoupu(distance_km, b_type, traffic_factor)
-                amount = np.random.uniform(10_000, 1_000_000)
-
-            if b_type not in ['现金清点']:
-                # 现金清点已赋值 amount
-                if b_type == '金库调拨':
-                    amount = np.random.uniform(5_000_000, 20_000_000)
-
-            # 标准距离 & 超距
-            area_type = get_area_type_from_zhoupu(region)
-            area_classification = get_shanghai_area_classification_from_zhoupu()
-            standard_distance = area_classification[area_type]['standard_km'].get(b_type, 35)
-            over_info = calculate_over_distance_cost(distance_km, standard_distance, b_type)
-
-            # 成本组件
-            if b_type == '现金清点':
-                labor_cost = counting_res['labor_cost']
-                equipment_cost = counting_res['equipment_cost']
-                vehicle_cost = 0
-                over_distance_cost = 0
-            elif b_type == '金库调拨':
-                vault_res = calculate_vault_transfer_cost()
-                vehicle_cost = vault_res['vehicle_cost']
-                labor_cost = 0
-                equipment_cost = 0
-                over_distance_cost = over_info['over_distance_cost']
-            else:
-                time_hours = time_duration / 60
-                veh_cost, veh_detail = calculate_vehicle_cost(distance_km, time_hours, region)
-                vehicle_cost = veh_cost
-                labor_cost = 0
-                equipment_cost = distance_km * 2.8
-                over_distance_cost = over_info['over_distance_cost']
-
-            # 日级冲击乘子应用（不破坏原逻辑：原 total_cost 仅乘场景 multiplier + time_weight；此处多一层 cost_multiplier_day 标记）
-            scenario_multiplier = 1.0
-            for sc in active_shocks:
-                if sc == '高需求期':
-                    scenario_multiplier *= 1.1
-                elif sc == '紧急状况':
-                    scenario_multiplier *= 1.5
-                elif sc == '节假日':
-                    scenario_multiplier *= 1.5
-
-            time_weight = np.random.choice([1.0, 1.1, 1.3, 1.6], p=[0.4, 0.3, 0.2, 0.1])
-            base_total_cost = vehicle_cost + labor_cost + equipment_cost
-            total_cost = base_total_cost * scenario_multiplier * time_weight * cost_multiplier_day
-
-            # 初步异常判定：成本或时间/距离尾部
-            # 占位，稍后再统一基于集合统计添加最终 is_anomaly
-            records.append({
-                'start_time': ts,
-                'business_type': b_type,
-                'region': region,
-                'distance_km': distance_km,
-                'time_duration': time_duration,
-                'amount': amount,
-                'vehicle_cost': vehicle_cost,
-                'labor_cost': labor_cost,
-                'equipment_cost': equipment_cost,
-                'over_distance_cost': over_distance_cost,
-                'standard_distance': standard_distance,
-                'over_distance': over_info['over_distance'],
-                'base_total_cost': base_total_cost,
-                'scenario_multiplier': scenario_multiplier,
-                'time_weight': time_weight,
-                'cost_day_multiplier': cost_multiplier_day,
-                'total_cost': total_cost,
-                'shock_label': ','.join(active_shocks) if active_shocks else '正常'
-            })
-
-    df_sim = pd.DataFrame(records)
-    if df_sim.empty:
-        return df_sim
-
-    # 统一异常判断（保持风格）：根据分位+效率构造
-    cost_q90 = df_sim['total_cost'].quantile(0.9)
-    time_q85 = df_sim['time_duration'].quantile(0.85)
-    dist_q80 = df_sim['distance_km'].quantile(0.8)
-    df_sim['efficiency_ratio'] = np.random.beta(3, 2, len(df_sim))
-    df_sim['is_anomaly'] = (
-        (df_sim['total_cost'] > cost_q90) |
-        (df_sim['time_duration'] > time_q85) |
-        (df_sim['distance_km'] > dist_q80) |
-        (df_sim['efficiency_ratio'] < 0.3)
-    )
-
-    # 异常原因
-    anomaly_reasons = []
-    for _, r in df_sim.iterrows():
-        if r['is_anomaly']:
-            if r['total_cost'] > cost_q90:
-                reasons = ['设备故障延误', '路线拥堵严重', '人员配置不足', '紧急调度变更']
-            elif r['time_duration'] > time_q85:
-                reasons = ['操作流程复杂', '等待时间过长', '交接手续繁琐', '安全检查延时']
-            elif r['distance_km'] > dist_q80:
-                reasons = ['最优路线受阻', '临时改道', 'GPS导航偏差', '交通管制影响']
-            elif r['efficiency_ratio'] < 0.3:
-                reasons = ['人员操作失误', '系统响应缓慢', '协调配合问题', '应急预案启动']
-            else:
-                reasons = ['天气因素影响', '客户特殊要求', '监管部门检查', '突发安全事件']
-            anomaly_reasons.append(np.random.choice(reasons))
-        else:
-            anomaly_reasons.append('正常')
-    df_sim['anomaly_reason'] = anomaly_reasons
-    df_sim['date'] = df_sim['start_time'].dt.date
-    return df_sim
-
-def optimize_cost_allocation(
-    df: pd.DataFrame,
-    objective: str = 'min_total_cost',
-    anomaly_penalty: float = 0.2,
-    weight_bounds=(0.5, 1.5),
-    step: float = 0.1
-):
-    """成本分摊动态优化引擎（不修改原 total_cost，只提供推荐权重）。
-
-    思路:
-        假设可调系数 α(车辆), β(人工), γ(设备)，对基础成本组件进行再权重：
-            new_cost = α*vehicle_cost + β*labor_cost + γ*equipment_cost
-        目标函数:
-            1) min_total_cost: Σ new_cost
-            2) min_cost_with_anomaly_penalty: Σ new_cost * (1 + anomaly_penalty*is_anomaly)
-
-        约束: α,β,γ ∈ [bounds]；最终报告将正规化为占比。
-        采用网格搜索（避免引入外部依赖）。
-    返回:
-        dict: {baseline_total, best_total, improvement_pct, best_weights_raw, best_weights_normalized, objective_trace(DataFrame)}
+    缓存只以数值参数（次数、容差、采样方式）为键，同参数的页面刷新与各会话共用同一任务；
+    本函数不输出任何页面元素，进度与结果由 render_monte_carlo_panel 轮询任务句柄展示。
+    给出 mean_tolerance / p95_tolerance（百分点）时为目标精度模式：总优化百分比的均值与 p95
+    置信区间宽度均小于容差即停止，iterations 作为次数上限，实际次数见 results['convergence']。
+    sampling: 'random' / 'antithetic' / 'sobol' / 'halton'，后三者为方差缩减与准蒙特卡洛采样。
+    结果按流式汇总（summary='streaming'）只保留统计量与总优化百分比的固定分箱直方图，
+    缓存内容约数 KB，与模拟次数无关。
     """
-    if df.empty:
-        return {}
-    low, high = weight_bounds
-    weight_range = np.arange(low, high + 1e-9, step)
-
-    baseline_total = (df['vehicle_cost'] + df['labor_cost'] + df['equipment_cost']).sum()
-    best = None
-    records = []
-
-    for a in weight_range:
-        for b in weight_range:
-            for c in weight_range:
-                new_cost_components = a*df['vehicle_cost'] + b*df['labor_cost'] + c*df['equipment_cost']
-                if objective == 'min_total_cost':
-                    obj_val = new_cost_components.sum()
-                else:  # 带异常惩罚
-                    if 'is_anomaly' in df.columns:
-                        obj_val = (new_cost_components * (1 + anomaly_penalty * df['is_anomaly'].astype(int))).sum()
-                    else:
-                        obj_val = new_cost_components.sum()
-                records.append({'a': a, 'b': b, 'c': c, 'objective': obj_val})
-                if best is None or obj_val < best['objective']:
-                    best = {'a': a, 'b': b, 'c': c, 'objective': obj_val}
-
-    trace_df = pd.DataFrame(records)
-    norm_sum = best['a'] + best['b'] + best['c']
-    normalized = {k: best[k]/norm_sum for k in ['a','b','c']}
-
-    improvement_pct = (baseline_total - best['objective']) / baseline_total * 100 if baseline_total > 0 else 0
-    return {
-        'baseline_total': baseline_total,
-        'best_total': best['objective'],
-        'improvement_pct': improvement_pct,
-        'best_weights_raw': {k: best[k] for k in ['a','b','c']},
-        'best_weights_normalized': normalized,
-        'objective_trace': trace_df.sort_values('objective').head(50)  # 前50最优记录
-    }
-
-@st.cache_data(ttl=600)
-def run_monte_carlo_optimization(iterations=100000):
-    """10万次蒙特卡洛模拟优化分析"""
-    
-    st.write(f"🔄 正在运行 {iterations:,} 次蒙特卡洛模拟...")
-    progress_bar = st.progress(0)
-    
-    optimization_results = []
-    route_savings = []
-    schedule_savings = []
-    risk_savings = []
-    
-    base_route_cost = 1000
-    base_schedule_cost = 800
-    base_risk_cost = 300
-    
-    for i in range(iterations):
-        route_optimization = np.random.beta(2, 5) * 0.15
-        route_saving = base_route_cost * route_optimization
-        route_savings.append(route_saving)
-        
-        schedule_optimization = np.random.beta(3, 7) * 0.12
-        schedule_saving = base_schedule_cost * schedule_optimization
-        schedule_savings.append(schedule_saving)
-        
-        risk_optimization = np.random.beta(1, 8) * 0.06
-        risk_saving = base_risk_cost * risk_optimization
-        risk_savings.append(risk_saving)
-        
-        total_saving = route_saving + schedule_saving + risk_saving
-        total_percentage = total_saving / (base_route_cost + base_schedule_cost + base_risk_cost)
-        
-        optimization_results.append({
-            'iteration': i,
-            'route_saving': route_saving,
-            'schedule_saving': schedule_saving, 
-            'risk_saving': risk_saving,
-            'total_saving': total_saving,
-            'total_percentage': total_percentage * 100
-        })
-        
-        if i % 10000 == 0:
-            progress_bar.progress(i / iterations)
-    
-    progress_bar.progress(1.0)
-    
-    route_savings = np.array(route_savings)
-    schedule_savings = np.array(schedule_savings)
-    risk_savings = np.array(risk_savings)
-    total_savings = route_savings + schedule_savings + risk_savings
-    total_percentages = total_savings / (base_route_cost + base_schedule_cost + base_risk_cost) * 100
-    
-    results = {
-        'iterations': iterations,
-        'route_optimization': {
-            'mean': np.mean(route_savings / base_route_cost * 100),
-            'median': np.median(route_savings / base_route_cost * 100),
-            'p95': np.percentile(route_savings / base_route_cost * 100, 95),
-            'savings_amount': np.mean(route_savings)
-        },
-        'schedule_optimization': {
-            'mean': np.mean(schedule_savings / base_schedule_cost * 100),
-            'median': np.median(schedule_savings / base_schedule_cost * 100),
-            'p95': np.percentile(schedule_savings / base_schedule_cost * 100, 95),
-            'savings_amount': np.mean(schedule_savings)
-        },
-        'risk_optimization': {
-            'mean': np.mean(risk_savings / base_risk_cost * 100),
-            'median': np.median(risk_savings / base_risk_cost * 100),
-            'p95': np.percentile(risk_savings / base_risk_cost * 100, 95),
-            'savings_amount': np.mean(risk_savings)
-        },
-        'total_optimization': {
-            'mean': np.mean(total_percentages),
-            'median': np.median(total_percentages),
-            'p95': np.percentile(total_percentages, 95),
-            'total_amount': np.mean(total_savings),
-            'confidence_95': np.percentile(total_percentages, [2.5, 97.5])
-        }
-    }
-    
-    st.success(f"✅ {iterations:,} 次模拟完成！")
-    return results, pd.DataFrame(optimization_results)
+    return submit_monte_carlo_job(
+        iterations, mean_tolerance, p95_tolerance, sampling=sampling, summary='streaming'
+    )
 
-@st.cache_data(ttl=300)
-def simulate_turnover_optimization():
-    """模拟现金清点周转效率优化"""
-    
-    current_large_counting_time = 280
-    current_small_counting_time = 180
-    current_processing_efficiency = 0.65
-    
-    optimized_large_counting_time = 240
-    optimized_small_counting_time = 150
-    optimized_processing_efficiency = 0.82
-    
-    results = {
-        'current_times': [],
-        'optimized_times': [],
-        'current_efficiency': [],
-        'optimized_efficiency': []
-    }
-    
-    for _ in range(1000):
-        is_large_amount = np.random.random() < 0.3
-        
-        if is_large_amount:
-            current_time = np.random.normal(current_large_counting_time, 30)
-            optimized_time = np.random.normal(optimized_large_counting_time, 25)
-        else:
-            current_time = np.random.normal(current_small_counting_time, 20)
-            optimized_time = np.random.normal(optimized_small_counting_time, 15)
-        
-        current_eff = np.random.normal(current_processing_efficiency, 0.1)
-        optimized_eff = np.random.normal(optimized_processing_efficiency, 0.08)
-        
-        results['current_times'].append(max(60, current_time))
-        results['optimized_times'].append(max(45, optimized_time))
-        results['current_efficiency'].append(max(0.3, min(0.9, current_eff)))
-        results['optimized_efficiency'].append(max(0.4, min(0.95, optimized_eff)))
-    
-    current_avg_time = np.mean(results['current_times'])
-    optimized_avg_time = np.mean(results['optimized_times'])
-    
-    daily_processing_capacity_current = (8 * 60) / current_avg_time
-    daily_processing_capacity_optimized = (8 * 60) / optimized_avg_time
-    
-    current_turnover_days = 30
-    optimized_turnover_days = current_turnover_days * (current_avg_time / optimized_avg_time) * 0.8
-    
-    turnover_improvement = (current_turnover_days - optimized_turnover_days) / current_turnover_days * 100
-    
-    return {
-        'current_avg_time': current_avg_time,
-        'optimized_avg_time': optimized_avg_time,
-        'time_reduction': (current_avg_time - optimized_avg_time) / current_avg_time * 100,
-        'current_turnover_days': current_turnover_days,
-        'optimized_turnover_days': optimized_turnover_days,
-        'turnover_improvement': turnover_improvement,
-        'current_efficiency': np.mean(results['current_efficiency']),
-        'optimized_efficiency': np.mean(results['optimized_efficiency']),
-        'results': results
-    }
+# 周转敏感性曲面的横轴（大笔占比）与可选纵轴（显示名 -> (参数名, 取值)），各轴均含默认参数取值
+TURNOVER_SHARE_VALUES = np.round(np.linspace(0.1, 0.6, 11), 2)
+TURNOVER_SENSITIVITY_AXES = {
+    '优化后大笔清点时长（分钟）': ('optimized_large_time_mean', np.linspace(200, 280, 11)),
+    '优化后小笔清点时长（分钟）': ('optimized_small_time_mean', np.linspace(120, 180, 11)),
+    '当前大笔清点时长（分钟）': ('current_large_time_mean', np.linspace(240, 320, 11)),
+    '当前小笔清点时长（分钟）': ('current_small_time_mean', np.linspace(150, 210, 11))
+}
+
+@st.cache_data(ttl=600, show_spinner="正在计算周转敏感性曲面...")
+def simulate_turnover_sensitivity(axis_label, n_draws=2 ** 20):
+    """大笔占比 × 所选时长参数的场景网格，一次批量模拟（每个场景约 10^6 次 Sobol 抽样）"""
+    param, values = TURNOVER_SENSITIVITY_AXES[axis_label]
+    scenarios = turnover_scenario_grid(large_amount_share=TURNOVER_SHARE_VALUES, **{param: values})
+    return simulate_turnover_scenarios(scenarios, n_draws=n_draws, sampling='sobol')
 
 # ==================== 验证与预测相关函数 ====================
 
@@ -1283,40 +509,80 @@ def validate_arima_accuracy(historical_data):
     
     return accuracy_results
 
-def advanced_prediction_models(daily_stats, days_ahead=14, model_type="ARIMA模型"):
-    """支持多种预测模型的高级预测函数"""
+@st.cache_resource
+def get_prediction_model_cache():
+    """跨会话共享的预测模型缓存（设置环境变量 PREDICTION_CACHE_DIR 时同时用 joblib 落盘）"""
+    return ForecastModelCache(cache_dir=os.environ.get('PREDICTION_CACHE_DIR') or None)
+
+def advanced_prediction_models(daily_stats, days_ahead=14, model_type="ARIMA模型", seed=42, cache=None):
+    """支持多种预测模型的高级预测函数
+
+    各指标的预测结果按 (模型类型, 指标, 日度序列指纹, 预测天数, 种子) 缓存，序列不变时
+    页面其他控件的改动不会触发重新拟合；seed 决定预测中注入的随机扰动，为 None 时不使用缓存。
+    cache 默认为 get_prediction_model_cache()。
+    model_type 为 "多输出模型" 时四个指标共用一个多输出随机森林（forecast_engine.multi_output_forecast），
+    一次拟合、一次预测全部天数；样本不足时退回逐指标的机器学习模型。
+    """
     predictions = {}
+    if cache is None and seed is not None:
+        cache = get_prediction_model_cache()
     
     daily_stats_sorted = daily_stats.sort_values('date').reset_index(drop=True)
     daily_stats_sorted['date_num'] = range(len(daily_stats_sorted))
     
     metrics = ['total_cost', 'business_count', 'avg_efficiency', 'anomaly_rate']
     
-    for metric in metrics:
+    if model_type == "多输出模型":
+        def fit_multi_output():
+            return multi_output_forecast(
+                daily_stats_sorted, metrics, days_ahead, random_state=42 if seed is None else seed
+            )
         try:
-            y = daily_stats_sorted[metric].values
-            dates = daily_stats_sorted['date'].values
-            
-            if model_type == "ARIMA模型":
-                predictions[metric] = arima_prediction(y, dates, days_ahead, metric)
-            elif model_type == "机器学习":
-                predictions[metric] = ml_prediction(y, dates, days_ahead, metric)
-            elif model_type == "时间序列":
-                predictions[metric] = time_series_prediction(y, dates, days_ahead, metric)
-            else:
-                predictions[metric] = arima_prediction(y, dates, days_ahead, metric)
-                
-        except Exception as e:
-            predictions[metric] = fallback_prediction_simple(daily_stats_sorted, metric, days_ahead)
+            if seed is None:
+                return fit_multi_output()
+            key = forecast_cache_key(
+                model_type, ','.join(metrics), daily_stats_sorted[metrics].values,
+                daily_stats_sorted['date'].values, days_ahead, seed
+            )
+            return cache.get_or_compute(key, fit_multi_output)
+        except ValueError:
+            model_type = "机器学习"
+    
+    prediction_funcs = {
+        "ARIMA模型": arima_prediction,
+        "机器学习": ml_prediction,
+        "时间序列": time_series_prediction
+    }
+    predict = prediction_funcs.get(model_type, arima_prediction)
+    
+    for metric_index, metric in enumerate(metrics):
+        y = daily_stats_sorted[metric].values
+        dates = daily_stats_sorted['date'].values
+        # 每个指标独立的随机流，结果与指标的计算顺序无关
+        rng = None if seed is None else task_rng(seed, metric_index)
+        
+        def fit_and_predict():
+            try:
+                return predict(y, dates, days_ahead, metric, rng=rng)
+            except Exception:
+                return fallback_prediction_simple(y, dates, days_ahead, metric, rng=rng)
+        
+        if seed is None:
+            predictions[metric] = fit_and_predict()
+        else:
+            key = forecast_cache_key(model_type, metric, y, dates, days_ahead, seed)
+            predictions[metric] = cache.get_or_compute(key, fit_and_predict)
     
     return predictions
 
-def arima_prediction(y, dates, days_ahead, metric):
-    """ARIMA模型预测"""
+def arima_prediction(y, dates, days_ahead, metric, rng=None):
+    """ARIMA模型预测（rng 为随机扰动的来源，缺省使用全局 np.random）"""
     from sklearn.linear_model import LinearRegression
     
+    rng = np.random if rng is None else rng
+    
     if len(y) < 7:
-        return fallback_prediction_simple(y, dates, days_ahead, metric)
+        return fallback_prediction_simple(y, dates, days_ahead, metric, rng=rng)
     
     window = min(7, len(y) // 3)
     trend = np.convolve(y, np.ones(window)/window, mode='same')
@@ -1344,7 +610,7 @@ def arima_prediction(y, dates, days_ahead, metric):
         
         trend_component = trend[-1] + recent_trend * (i / 5)
         seasonal_component = seasonal_pattern[i % 7] * 0.8
-        noise = np.random.normal(0, np.std(y) * 0.1)
+        noise = rng.normal(0, np.std(y) * 0.1)
         
         prediction = trend_component + seasonal_component + noise
         
@@ -1362,7 +628,7 @@ def arima_prediction(y, dates, days_ahead, metric):
         confidence_upper.append(prediction + 1.96 * std_error)
         confidence_lower.append(max(0, prediction - 1.96 * std_error))
     
-    r2 = max(0.82, min(0.94, 0.85 + np.random.uniform(-0.03, 0.09)))
+    r2 = max(0.82, min(0.94, 0.85 + rng.uniform(-0.03, 0.09)))
     
     return {
         'dates': future_dates,
@@ -1373,156 +639,57 @@ def arima_prediction(y, dates, days_ahead, metric):
         'mse': np.var(y) * 0.1
     }
 
-def ml_prediction(y, dates, days_ahead, metric):
-    """机器学习模型预测（随机森林+梯度提升）"""
-    from sklearn.ensemble import RandomForestRegressor
-    
+def ml_prediction(y, dates, days_ahead, metric, rng=None, strategy='auto'):
+    """机器学习模型预测（随机森林，实现见 forecast_engine.multi_output_forecast）
+
+    strategy: 'recursive' 一步模型逐日滚动预测；'direct' 一次预测全部天数；
+              'auto'（默认）历史足够时取 direct，否则取 recursive。
+    区间按袋外（OOB）残差给出，训练集只预测一次。
+    """
     if len(y) < 10:
-        return fallback_prediction_simple(y, dates, days_ahead, metric)
-    
-    features = []
-    targets = []
-    
-    window_size = min(5, len(y) // 2)
-    for i in range(window_size, len(y)):
-        feature = list(y[i-window_size:i])
-        date_obj = pd.to_datetime(dates[i])
-        feature.extend([
-            date_obj.weekday(),
-            date_obj.day,
-            i,
-            np.mean(y[max(0, i-7):i]),
-            np.std(y[max(0, i-7):i])
-        ])
-        features.append(feature)
-        targets.append(y[i])
-    
-    if len(features) == 0:
-        return fallback_prediction_simple(y, dates, days_ahead, metric)
-    
-    features = np.array(features)
-    targets = np.array(targets)
-    
-    model = RandomForestRegressor(n_estimators=50, random_state=42)
-    model.fit(features, targets)
-    
-    future_dates = []
-    future_predictions = []
-    confidence_upper = []
-    confidence_lower = []
-    
-    last_date = pd.to_datetime(dates[-1])
-    current_window = list(y[-window_size:])
-    
-    for i in range(1, days_ahead + 1):
-        future_date = last_date + timedelta(days=i)
-        
-        feature = list(current_window)
-        feature.extend([
-            future_date.weekday(),
-            future_date.day,
-            len(y) + i - 1,
-            np.mean(current_window),
-            np.std(current_window)
-        ])
-        
-        prediction = model.predict([feature])[0]
-        
-        current_window = current_window[1:] + [prediction]
-        
-        if metric == 'avg_efficiency':
-            prediction = max(0.3, min(0.9, prediction))
-        elif metric == 'anomaly_rate':
-            prediction = max(0.02, min(0.25, prediction))
-        elif prediction < 0:
-            prediction = abs(prediction)
-        
-        train_error = np.std(targets - model.predict(features))
-        
-        future_dates.append(future_date)
-        future_predictions.append(prediction)
-        confidence_upper.append(prediction + 1.96 * train_error)
-        confidence_lower.append(max(0, prediction - 1.96 * train_error))
+        return fallback_prediction_simple(y, dates, days_ahead, metric, rng=rng)
     
-    train_score = model.score(features, targets)
-    r2 = max(0.88, min(0.96, train_score))
-    
-    return {
-        'dates': future_dates,
-        'values': future_predictions,
-        'upper_bound': confidence_upper,
-        'lower_bound': confidence_lower,
-        'model_accuracy': r2,
-        'mse': train_error ** 2
-    }
+    try:
+        forecasts = multi_output_forecast(
+            pd.DataFrame({'date': dates, metric: y}), [metric], days_ahead, strategy=strategy
+        )
+    except ValueError:
+        return fallback_prediction_simple(y, dates, days_ahead, metric, rng=rng)
+    return forecasts[metric]
+
+def time_series_prediction(y, dates, days_ahead, metric, rng=None, seasonal='additive'):
+    """经典时间序列预测（Holt-Winters 指数平滑，7 天季节；实现见 forecast_engine.fit_holt_winters）
 
-def time_series_prediction(y, dates, days_ahead, metric):
-    """经典时间序列预测（指数平滑+移动平均）"""
+    平滑参数按一步预测误差平方和最小拟合，区间为解析预测区间；不足两个完整周期时退回无季节的 Holt 线性模型。
+    """
     
     if len(y) < 5:
-        return fallback_prediction_simple(y, dates, days_ahead, metric)
-    
-    alpha = 0.3
-    beta = 0.1
+        return fallback_prediction_simple(y, dates, days_ahead, metric, rng=rng)
     
-    s = [y[0]]
-    b = [y[1] - y[0]]
-    
-    for i in range(1, len(y)):
-        s_new = alpha * y[i] + (1 - alpha) * (s[-1] + b[-1])
-        b_new = beta * (s_new - s[-1]) + (1 - beta) * b[-1]
-        s.append(s_new)
-        b.append(b_new)
-    
-    future_dates = []
-    future_predictions = []
-    confidence_upper = []
-    confidence_lower = []
+    if len(y) < 2 * HW_SEASON_LENGTH:
+        seasonal = 'none'
+    fit = fit_holt_winters(y, seasonal=seasonal)
+    mean, lower, upper = holt_winters_forecast(fit, days_ahead)
+    predictions = clip_metric_values(metric, mean[0])
+    # 区间随点预测一起平移（与约束前的相对位置不变）
+    shift = predictions - mean[0]
     
     last_date = pd.to_datetime(dates[-1])
-    last_smooth = s[-1]
-    last_trend = b[-1]
-    
-    fitted = [s[i] + b[i] for i in range(len(s))]
-    errors = [y[i] - fitted[i] for i in range(len(y))]
-    error_std = np.std(errors)
-    
-    for i in range(1, days_ahead + 1):
-        future_date = last_date + timedelta(days=i)
-        
-        prediction = last_smooth + i * last_trend
-        
-        seasonal_adj = 0.05 * np.sin(2 * np.pi * i / 7) * prediction
-        prediction += seasonal_adj
-        
-        if metric == 'avg_efficiency':
-            prediction = max(0.3, min(0.9, prediction))
-        elif metric == 'anomaly_rate':
-            prediction = max(0.02, min(0.25, prediction))
-        elif prediction < 0:
-            prediction = abs(prediction)
-        
-        confidence_interval = error_std * np.sqrt(i)
-        
-        future_dates.append(future_date)
-        future_predictions.append(prediction)
-        confidence_upper.append(prediction + 1.96 * confidence_interval)
-        confidence_lower.append(max(0, prediction - 1.96 * confidence_interval))
-    
-    mse = np.mean([e**2 for e in errors])
+    mse = fit['sse'][0] / len(y)
     r2 = max(0.80, min(0.92, 1 - mse / np.var(y)))
     
     return {
-        'dates': future_dates,
-        'values': future_predictions,
-        'upper_bound': confidence_upper,
-        'lower_bound': confidence_lower,
+        'dates': [last_date + timedelta(days=i) for i in range(1, days_ahead + 1)],
+        'values': list(predictions),
+        'upper_bound': list(upper[0] + shift),
+        'lower_bound': list(np.maximum(0, lower[0] + shift)),
         'model_accuracy': r2,
         'mse': mse
     }
 
-def fallback_prediction_simple(y, dates, days_ahead, metric):
-    """简单回退预测方法"""
+def fallback_prediction_simple(y, dates, days_ahead, metric, rng=None):
+    """简单回退预测方法（rng 为随机扰动的来源，缺省使用全局 np.random）"""
+    rng = np.random if rng is None else rng
     if len(y) == 0:
         base_value = 1000 if metric == 'total_cost' else 0.5
     else:
@@ -1543,7 +710,7 @@ def fallback_prediction_simple(y, dates, days_ahead, metric):
         else:
             trend = 0
             
-        prediction = base_value + trend * i + np.random.normal(0, abs(base_value) * 0.05)
+        prediction = base_value + trend * i + rng.normal(0, abs(base_value) * 0.05)
         
         if metric == 'avg_efficiency':
             prediction = max(0.3, min(0.9, prediction))
@@ -1589,7 +756,7 @@ def generate_decision_support(df, predictions):
         recommendations.append("✅ 成本趋势稳定，维持当前运营策略")
         recommendations.append("🎯 建议持续优化业务流程")
     
-    business_type_analysis = df.groupby('business_type')['total_cost'].agg(['mean', 'count'])
+    business_type_analysis = df.groupby('business_type', observed=True)['total_cost'].agg(['mean', 'count'])
     high_cost_business = business_type_analysis['mean'].idxmax()
     high_volume_business = business_type_analysis['count'].idxmax()
     
@@ -1813,7 +980,7 @@ with col_right:
 st.subheader("📋 业务类型聚合表（总成本/平均成本/效率等）")
 
 # 按业务类型汇总关键指标
-business_summary = df.groupby('business_type').agg({
+business_summary = df.groupby('business_type', observed=True).agg({
     'total_cost': ['sum', 'mean'],
     'efficiency_ratio': 'mean',
     'is_anomaly': 'mean',
@@ -1847,7 +1014,7 @@ with tab1:
     
     with col1:
         # 业务类型成本占比饼图
-        business_costs = df.groupby('business_type')['total_cost'].sum().reset_index()
+        business_costs = df.groupby('business_type', observed=True)['total_cost'].sum().reset_index()
         business_costs['业务类型'] = business_costs['business_type']
         business_costs['总成本'] = business_costs['total_cost']
         business_costs['显示名称'] = business_costs['business_type'].apply(
@@ -1870,7 +1037,7 @@ with tab1:
     
     with col2:
         # 业务类型平均成本对比
-        business_avg_costs = df.groupby('business_type')['total_cost'].mean().reset_index()
+        business_avg_costs = df.groupby('business_type', observed=True)['total_cost'].mean().reset_index()
         business_avg_costs['业务类型'] = business_avg_costs['business_type']
         business_avg_costs['平均成本'] = business_avg_costs['total_cost']
         
@@ -1957,7 +1124,7 @@ with tab3:
     
     with col1:
         # 区域平均成本条形图
-        region_costs = df.groupby('region')['total_cost'].mean().reset_index()
+        region_costs = df.groupby('region', observed=True)['total_cost'].mean().reset_index()
         region_costs['区域'] = region_costs['region']
         region_costs['平均成本'] = region_costs['total_cost']
         
@@ -1979,7 +1146,7 @@ with tab3:
     
     with col2:
         # 区域详细分析表
-        region_analysis = df.groupby('region').agg({
+        region_analysis = df.groupby('region', observed=True).agg({
             'total_cost': ['mean', 'sum', 'count'],
             'distance_km': 'mean',
             'time_duration': 'mean',
@@ -2007,7 +1174,7 @@ with tab4:
     
     with col1:
         # 场景分布饼图
-        scenario_counts = df['market_scenario'].value_counts()
+        scenario_counts = df['market_scenario'].value_counts().loc[lambda counts: counts > 0]
         scenario_labels = ['正常', '高需求期', '紧急状况', '节假日']
         scenario_mapping = {'正常': '正常', '高需求期': '高需求期', '紧急状况': '紧急状况', '节假日': '节假日'}
         
@@ -2045,6 +1212,17 @@ with tab4:
         )
         st.plotly_chart(fig_weights, use_container_width=True, key="cost_allocation_weights_bar")
 
+        # 分段分摊权重表（各分段独立优化的 α/β/γ）
+        segment_weights = cost_optimization.get('segment_weights')
+        if segment_weights is not None and not segment_weights.empty:
+            segment_table = segment_weights[[
+                'business_type', 'region', 'area_type', 'records', 'a', 'b', 'c', 'improvement_pct'
+            ]].copy()
+            segment_table.columns = ['业务类型', '区域', '地区类型', '业务量', '车辆权重α', '人工权重β', '设备权重γ', '优化幅度(%)']
+            segment_table['优化幅度(%)'] = segment_table['优化幅度(%)'].round(2)
+            st.write("**分段分摊权重（业务类型×区域×地区类型）**")
+            st.dataframe(segment_table, use_container_width=True, height=260)
+
 # 时段权重分组表
 st.subheader("📊 时段权重分组表")
 time_factor_analysis = df.groupby('time_weight').agg({
@@ -2098,83 +1276,112 @@ with col_risk4:
     st.metric("低效率预警", f"{efficiency_risk}笔")
 
 # 蒙特卡洛模拟区
-st.subheader("🎲 蒙特卡洛优化模拟（10万次）")
+st.subheader("🎲 蒙特卡洛优化模拟（Sobol准随机采样，达到目标精度即停止）")
+
+def render_monte_carlo_panel(job, polling=False):
+    """蒙特卡洛模拟区：任务未完成时显示进度占位，完成后展示指标与图表"""
+    if not job.done():
+        st.progress(job.progress, text=f"🔄 后台模拟中：已完成 {job.completed:,} / 最多 {job.total:,} 次")
+        st.info("模拟在后台运行，页面其余部分可正常浏览，结果生成后自动显示")
+        return
+    if polling:
+        # 任务刚结束：整页重跑一次，以不带定时刷新的方式重新挂载本区
+        st.rerun()
+    if job.status != 'done':
+        # 失败或取消的任务不保留在缓存中，下次重跑重新提交
+        run_monte_carlo_optimization.clear()
+        st.error(f"蒙特卡洛模拟未完成（{job.status}）：{job.exception()}，页面下次刷新时将重新运行")
+        return
+
+    mc_results, mc_data = job.result()
+    convergence = mc_results.get('convergence')
+    if convergence is not None:
+        status = "已达到目标精度" if convergence['converged'] else "已达次数上限"
+        st.success(f"✅ {convergence['iterations']:,} 次模拟完成，{status}！")
+    else:
+        st.success(f"✅ {mc_results['iterations']:,} 次模拟完成！")
 
-# 直接运行蒙特卡洛模拟
-mc_results, mc_data = run_monte_carlo_optimization(100000)
+    col_mc1, col_mc2, col_mc3 = st.columns(3)
 
-col_mc1, col_mc2, col_mc3 = st.columns(3)
+    with col_mc1:
+        st.metric(
+            "路线优化潜力",
+            f"{mc_results['route_optimization']['mean']:.1f}%",
+            f"最高可达{mc_results['route_optimization']['p95']:.1f}%"
+        )
 
-with col_mc1:
-    st.metric(
-        "路线优化潜力",
-        f"{mc_results['route_optimization']['mean']:.1f}%",
-        f"最高可达{mc_results['route_optimization']['p95']:.1f}%"
-    )
+    with col_mc2:
+        st.metric(
+            "排班优化潜力", 
+            f"{mc_results['schedule_optimization']['mean']:.1f}%",
+            f"最高可达{mc_results['schedule_optimization']['p95']:.1f}%"
+        )
 
-with col_mc2:
-    st.metric(
-        "排班优化潜力", 
-        f"{mc_results['schedule_optimization']['mean']:.1f}%",
-        f"最高可达{mc_results['schedule_optimization']['p95']:.1f}%"
-    )
+    with col_mc3:
+        st.metric(
+            "风险控制优化",
+            f"{mc_results['risk_optimization']['mean']:.1f}%",
+            f"最高可达{mc_results['risk_optimization']['p95']:.1f}%"
+        )
 
-with col_mc3:
-    st.metric(
-        "风险控制优化",
-        f"{mc_results['risk_optimization']['mean']:.1f}%",
-        f"最高可达{mc_results['risk_optimization']['p95']:.1f}%"
-    )
+    # 模拟结果可视化
+    col_chart1, col_chart2 = st.columns(2)
 
-# 模拟结果可视化
-col_chart1, col_chart2 = st.columns(2)
+    with col_chart1:
+        fig_mc_dist = px.bar(
+            mc_data,
+            x='bin_center',
+            y='count',
+            title="总体优化效果分布",
+            color_discrete_sequence=['#007bff']
+        )
+        fig_mc_dist.update_layout(
+            paper_bgcolor='white',
+            plot_bgcolor='white',
+            font_color='black',
+            bargap=0,
+            xaxis_title="优化效果百分比",
+            yaxis_title="频次"
+        )
+        st.plotly_chart(fig_mc_dist, use_container_width=True, key="risk_mc_distribution")
+
+    with col_chart2:
+        optimization_summary = pd.DataFrame({
+            '优化类型': ['路线优化', '排班优化', '风险控制'],
+            '平均节约': [
+                mc_results['route_optimization']['savings_amount'],
+                mc_results['schedule_optimization']['savings_amount'],
+                mc_results['risk_optimization']['savings_amount']
+            ],
+            '优化比例': [
+                mc_results['route_optimization']['mean'],
+                mc_results['schedule_optimization']['mean'],
+                mc_results['risk_optimization']['mean']
+            ]
+        })
 
-with col_chart1:
-    fig_mc_dist = px.histogram(
-        mc_data,
-        x='total_percentage',
-        title="总体优化效果分布",
-        nbins=50,
-        color_discrete_sequence=['#007bff']
-    )
-    fig_mc_dist.update_layout(
-        paper_bgcolor='white',
-        plot_bgcolor='white',
-        font_color='black',
-        xaxis_title="优化效果百分比",
-        yaxis_title="频次"
-    )
-    st.plotly_chart(fig_mc_dist, use_container_width=True, key="risk_mc_distribution")
-
-with col_chart2:
-    optimization_summary = pd.DataFrame({
-        '优化类型': ['路线优化', '排班优化', '风险控制'],
-        '平均节约': [
-            mc_results['route_optimization']['savings_amount'],
-            mc_results['schedule_optimization']['savings_amount'],
-            mc_results['risk_optimization']['savings_amount']
-        ],
-        '优化比例': [
-            mc_results['route_optimization']['mean'],
-            mc_results['schedule_optimization']['mean'],
-            mc_results['risk_optimization']['mean']
-        ]
-    })
-    
-    fig_opt_summary = px.bar(
-        optimization_summary,
-        x='优化类型',
-        y='优化比例',
-        title="各类优化方案效果对比",
-        color='优化比例',
-        color_continuous_scale='Viridis'
-    )
-    fig_opt_summary.update_layout(
-        paper_bgcolor='white',
-        plot_bgcolor='white',
-        font_color='black'
-    )
-    st.plotly_chart(fig_opt_summary, use_container_width=True, key="risk_optimization_summary")
+        fig_opt_summary = px.bar(
+            optimization_summary,
+            x='优化类型',
+            y='优化比例',
+            title="各类优化方案效果对比",
+            color='优化比例',
+            color_continuous_scale='Viridis'
+        )
+        fig_opt_summary.update_layout(
+            paper_bgcolor='white',
+            plot_bgcolor='white',
+            font_color='black'
+        )
+        st.plotly_chart(fig_opt_summary, use_container_width=True, key="risk_optimization_summary")
+
+# 目标精度：总优化百分比均值的95%置信区间宽度≤0.02个百分点、p95≤0.05个百分点（最多10万次）
+mc_job = run_monte_carlo_optimization(
+    100000, mean_tolerance=0.02, p95_tolerance=0.05, sampling='sobol'
+)
+# 任务运行期间以片段（fragment）定时刷新进度，不阻塞分区3及之后内容的渲染
+mc_polling = not mc_job.done()
+st.fragment(render_monte_carlo_panel, run_every=MC_POLL_SECONDS if mc_polling else None)(mc_job, mc_polling)
 
 # 场景影响分析
 st.subheader("🌊 场景影响分析与预测验证")
@@ -2183,7 +1390,7 @@ col_scenario1, col_scenario2 = st.columns(2)
 
 with col_scenario1:
     # 不同市场场景下的成本分布
-    scenario_impact = df.groupby('market_scenario')['total_cost'].mean().reset_index()
+    scenario_impact = df.groupby('market_scenario', observed=True)['total_cost'].mean().reset_index()
     fig_scenario_impact = px.bar(
         scenario_impact,
         x='market_scenario',
@@ -2202,28 +1409,47 @@ with col_scenario1:
     st.plotly_chart(fig_scenario_impact, use_container_width=True, key="risk_scenario_impact")
 
 with col_scenario2:
-    # 周转效率优化模拟
-    turnover_results = simulate_turnover_optimization()
-    
-    turnover_comparison = pd.DataFrame({
-        '指标': ['当前模式', '优化模式'],
-        '平均处理时间': [turnover_results['current_avg_time'], turnover_results['optimized_avg_time']],
-        '周转天数': [turnover_results['current_turnover_days'], turnover_results['optimized_turnover_days']],
-        '处理效率': [turnover_results['current_efficiency'], turnover_results['optimized_efficiency']]
-    })
-    
-    fig_turnover = px.bar(
-        turnover_comparison,
-        x='指标',
-        y='平均处理时间',
-        title=f"周转优化模拟（提升{turnover_results['turnover_improvement']:.1f}%）",
-        color='指标',
-        color_discrete_sequence=['#dc3545', '#28a745']
+    # 周转效率敏感性曲面：大笔占比 × 所选处理时长，各场景共用同一组抽样
+    turnover_axis = st.selectbox(
+        "周转敏感性维度",
+        list(TURNOVER_SENSITIVITY_AXES),
+        key="risk_turnover_axis"
     )
+    turnover_param = TURNOVER_SENSITIVITY_AXES[turnover_axis][0]
+    turnover_grid = simulate_turnover_sensitivity(turnover_axis)
+    turnover_surface = turnover_grid.pivot(
+        index=turnover_param, columns='large_amount_share', values='turnover_improvement'
+    )
+    baseline_turnover = turnover_grid[
+        np.isclose(turnover_grid['large_amount_share'], TURNOVER_DEFAULT_PARAMS['large_amount_share']) &
+        np.isclose(turnover_grid[turnover_param], TURNOVER_DEFAULT_PARAMS[turnover_param])
+    ]['turnover_improvement'].iloc[0]
+
+    fig_turnover = go.Figure(go.Surface(
+        x=turnover_surface.columns,
+        y=turnover_surface.index,
+        z=turnover_surface.to_numpy(),
+        colorscale='RdYlGn',
+        colorbar=dict(title="提升%")
+    ))
+    fig_turnover.add_trace(go.Scatter3d(
+        x=[TURNOVER_DEFAULT_PARAMS['large_amount_share']],
+        y=[TURNOVER_DEFAULT_PARAMS[turnover_param]],
+        z=[baseline_turnover],
+        mode='markers',
+        marker=dict(size=5, color='black'),
+        name='当前设定'
+    ))
     fig_turnover.update_layout(
+        title=f"周转优化敏感性（当前设定提升{baseline_turnover:.1f}%）",
         paper_bgcolor='white',
         plot_bgcolor='white',
-        font_color='black'
+        font_color='black',
+        scene=dict(
+            xaxis_title="大笔占比",
+            yaxis_title=turnover_axis,
+            zaxis_title="周转提升 (%)"
+        )
     )
     st.plotly_chart(fig_turnover, use_container_width=True, key="risk_turnover_optimization")
 
@@ -2240,7 +1466,7 @@ col1, col2 = st.columns(2)
 
 with col1:
     # 1. 业务类型平均成本对比
-    business_costs = df.groupby('business_type')['total_cost'].mean().reset_index()
+    business_costs = df.groupby('business_type', observed=True)['total_cost'].mean().reset_index()
     business_costs['业务类型'] = business_costs['business_type']
     business_costs['平均成本'] = business_costs['total_cost']
     
@@ -2261,7 +1487,7 @@ with col1:
 
 with col2:
     # 2. 区域成本热力图
-    region_costs = df.groupby('region')['total_cost'].mean().reset_index()
+    region_costs = df.groupby('region', observed=True)['total_cost'].mean().reset_index()
     region_costs['区域'] = region_costs['region']
     region_costs['平均成本'] = region_costs['total_cost']
     
@@ -2371,7 +1597,7 @@ with col5:
 
 with col6:
     # 6. 市场场景影响
-    scenario_impact = df.groupby('market_scenario')['total_cost'].mean().reset_index()
+    scenario_impact = df.groupby('market_scenario', observed=True)['total_cost'].mean().reset_index()
     scenario_impact['市场场景'] = scenario_impact['market_scenario']
     scenario_impact['平均成本'] = scenario_impact['total_cost']
     
@@ -2655,7 +1881,7 @@ if len(high_cost_businesses) > 0:
     col_vis1, col_vis2 = st.columns(2)
     
     with col_vis1:
-        risk_by_type = high_cost_businesses['business_type'].value_counts()
+        risk_by_type = high_cost_businesses['business_type'].value_counts().loc[lambda counts: counts > 0]
         fig_risk = px.bar(
             x=risk_by_type.index,
             y=risk_by_type.values,
@@ -2690,7 +1916,7 @@ if len(high_cost_businesses) > 0:
 st.subheader("🌊 市场冲击场景影响分析")
 
 # 场景影响对比表
-scenario_impact = df.groupby('market_scenario').agg({
+scenario_impact = df.groupby('market_scenario', observed=True).agg({
     'total_cost': ['mean', 'count'],
     'efficiency_ratio': 'mean',
     'is_anomaly': 'mean'
@@ -2713,7 +1939,7 @@ with col_table1:
 
 with col_table2:
     # 市场环境成本影响评估
-    current_scenario_cost = df.groupby('market_scenario')['total_cost'].sum()
+    current_scenario_cost = df.groupby('market_scenario', observed=True)['total_cost'].sum()
     normal_cost = current_scenario_cost.get('正常', 0)
 
     if normal_cost > 0:
@@ -2807,7 +2033,7 @@ with anomaly_tabs[0]:
     
     with col_pie2:
         if anomaly_count > 0:
-            anomaly_by_business = df[df['is_anomaly']].groupby('business_type').size()
+            anomaly_by_business = df[df['is_anomaly']].groupby('business_type', observed=True).size()
             fig_business_anomaly = px.pie(
                 values=anomaly_by_business.values,
                 names=anomaly_by_business.index,
@@ -2863,7 +2089,7 @@ with anomaly_tabs[1]:
         
         # 正常业务详细数据
         st.subheader("正常业务详细数据")
-        normal_summary = normal_data.groupby('business_type').agg({
+        normal_summary = normal_data.groupby('business_type', observed=True).agg({
             'total_cost': ['mean', 'count'],
             'efficiency_ratio': 'mean',
             'distance_km': 'mean'
@@ -2961,7 +2187,7 @@ with anomaly_tabs[3]:
         
         with col_feat1:
             # 异常业务类型分布
-            anomaly_type_counts = anomaly_data['business_type'].value_counts()
+            anomaly_type_counts = anomaly_data['business_type'].value_counts().loc[lambda counts: counts > 0]
             fig_anomaly_types = px.pie(
                 values=anomaly_type_counts.values,
                 names=anomaly_type_counts.index,
@@ -3004,7 +2230,7 @@ with anomaly_tabs[3]:
         
         if 'anomaly_reason' in anomaly_data.columns:
             # 异常原因统计
-            reason_counts = anomaly_data['anomaly_reason'].value_counts().reset_index()
+            reason_counts = anomaly_data['anomaly_reason'].value_counts().loc[lambda counts: counts > 0].reset_index()
             reason_counts.columns = ['异常原因', '出现次数']
             reason_counts['占比(%)'] = (reason_counts['出现次数'] / len(anomaly_data) * 100).round(1)
             
@@ -3034,7 +2260,7 @@ with anomaly_tabs[3]:
             # 按业务类型分组的异常原因分析
             st.subheader("🔍 按业务类型的异常原因分析")
             
-            reason_by_business = anomaly_data.groupby(['business_type', 'anomaly_reason']).size().reset_index(name='count')
+            reason_by_business = anomaly_data.groupby(['business_type', 'anomaly_reason'], observed=True).size().reset_index(name='count')
             reason_pivot = reason_by_business.pivot(index='business_type', columns='anomaly_reason', values='count').fillna(0)
             
             # 转换为百分比显示
@@ -3052,7 +2278,7 @@ with anomaly_tabs[3]:
                 anomaly_data_copy['日期'] = anomaly_data_copy['start_time'].dt.date
                 anomaly_data_copy['异常原因'] = anomaly_data_copy['anomaly_reason']
                 
-                daily_reason = anomaly_data_copy.groupby(['日期', '异常原因']).size().reset_index(name='数量')
+                daily_reason = anomaly_data_copy.groupby(['日期', '异常原因'], observed=True).size().reset_index(name='数量')
                 
                 # 堆叠柱状图显示每日各种异常原因数量
                 fig_reason_trend = px.bar(
@@ -0,0 +1,58 @@
+"""流式汇总的状态大小：分位数估计器的桶数有上限，状态不随数值跨度与模拟次数增长"""
+import pickle
+
+import numpy as np
+
+from cost_engine import SKETCH_MAX_BUCKETS, LogHistogramQuantileSketch
+from montecarlo_engine import MC_OPTIMIZATION_TYPES, StreamingSavingsSummary, run_monte_carlo_batched
+
+
+def wide_range_savings(rng, n):
+    """跨越 24 个数量级的节约金额（对数均匀）"""
+    return {name: 10.0 ** rng.uniform(-12, 12, n) for name in MC_OPTIMIZATION_TYPES}
+
+
+def test_sketch_bucket_count_is_capped():
+    rng = np.random.default_rng(0)
+    sketch = LogHistogramQuantileSketch(0.0005)
+    for _ in range(5):
+        sketch.update(10.0 ** rng.uniform(-12, 12, 100_000))
+    assert len(sketch._counts) == SKETCH_MAX_BUCKETS
+    assert sketch._counts.sum() + sketch.zero_count == sketch.count == 500_000
+    # 高分位数不受合并影响，仍在相对精度之内
+    values = 10.0 ** rng.uniform(-12, 12, 100_000)
+    check = LogHistogramQuantileSketch(0.0005)
+    check.update(values)
+    exact = np.quantile(values, 0.99, method='lower')
+    assert abs(check.quantile(0.99) / exact - 1) <= 0.0005 * 2
+
+
+def test_merged_sketches_stay_capped():
+    rng = np.random.default_rng(1)
+    merged = LogHistogramQuantileSketch(0.0005)
+    for low, high in [(-12, -6), (-6, 0), (0, 6), (6, 12)]:
+        part = LogHistogramQuantileSketch(0.0005)
+        part.update(10.0 ** rng.uniform(low, high, 50_000))
+        merged.merge(part)
+    assert len(merged._counts) <= SKETCH_MAX_BUCKETS
+    assert merged.count == 200_000
+
+
+def test_streaming_summary_pickle_size_is_bounded():
+    rng = np.random.default_rng(2)
+    wide = StreamingSavingsSummary()
+    for _ in range(10):
+        wide.update(wide_range_savings(rng, 100_000))
+
+    # 4 个估计器 × 桶数上限 × int64，另加少量对象开销
+    bound = (len(MC_OPTIMIZATION_TYPES) + 1) * SKETCH_MAX_BUCKETS * 8 + 16_384
+    assert len(pickle.dumps(wide)) <= bound
+
+
+def test_streaming_result_payload_is_a_few_kb():
+    small, small_hist = run_monte_carlo_batched(10_000, seed=0, summary='streaming')
+    large, large_hist = run_monte_carlo_batched(2_000_000, seed=0, summary='streaming')
+    small_size = len(pickle.dumps((small, small_hist)))
+    large_size = len(pickle.dumps((large, large_hist)))
+    assert large_size < 8_192
+    assert abs(large_size - small_size) < 256
@@ -0,0 +1,105 @@
+"""交易明细表的紧凑内存模式
+
+维度列统一为固定取值表的 category（各生成器、各数据块之间编码一致，可直接拼接/分区落盘），
+数值列在精度允许处使用 float32，标记列使用 bool / 小整数类型。
+金额（amount）与总成本（total_cost、base_total_cost）保留 float64，避免大额与汇总时丢失精度。
+"""
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from cost_engine import (
+    ANOMALY_REASON_GROUPS,
+    BUSINESS_TYPES,
+    DEFAULT_SHOCK_SCENARIOS,
+    MARKET_SCENARIOS,
+    get_pudong_zhoupu_to_districts_distance,
+    get_shanghai_area_classification,
+    get_shanghai_area_classification_from_zhoupu
+)
+
+try:
+    import pyarrow  # noqa: F401  streamlit 依赖 pyarrow，一般均已安装
+    STRING_DTYPE = 'string[pyarrow]'
+except ImportError:
+    STRING_DTYPE = object
+
+def _shock_label_categories():
+    """冲击场景标签取值：'正常' 以及默认场景按顺序组合的所有叠加标签"""
+    names = [sc['name'] for sc in DEFAULT_SHOCK_SCENARIOS]
+    labels = ['正常']
+    for size in range(1, len(names) + 1):
+        labels.extend(','.join(combo) for combo in combinations(names, size))
+    return labels
+
+# 维度列及其已知取值（数据中出现的额外取值会追加在末尾，不会被置为缺失）
+CATEGORY_COLUMNS = {
+    'business_type': BUSINESS_TYPES,
+    'region': list(get_pudong_zhoupu_to_districts_distance().keys()),
+    'area_type': (
+        list(get_shanghai_area_classification().keys()) +
+        list(get_shanghai_area_classification_from_zhoupu().keys()) +
+        ['专线', '清点中心']
+    ),
+    'counting_type': ['', '大笔清点', '小笔清点'],
+    'market_scenario': MARKET_SCENARIOS,
+    'anomaly_reason': ['正常'] + [reason for group in ANOMALY_REASON_GROUPS for reason in group],
+    'shock_label': _shock_label_categories()
+}
+
+FLOAT32_COLUMNS = [
+    'distance_km', 'time_duration', 'efficiency_ratio',
+    'vehicle_cost', 'labor_cost', 'equipment_cost', 'over_distance_cost', 'over_distance',
+    'basic_cost', 'overtime_cost', 'over_km_cost', 'cost_per_km',
+    'scenario_multiplier', 'cost_day_multiplier',
+    'seasonal_factor', 'trend_factor', 'covid_impact', 'holiday_factor', 'economic_factor'
+]
+
+# time_weight 作为分组键使用，保留 float64 以免分组标签出现 1.2000000476837158 之类的尾差
+FLOAT64_COLUMNS = ['amount', 'total_cost', 'base_total_cost', 'time_weight']
+
+BOOL_COLUMNS = ['is_anomaly', 'has_machine']
+
+INTEGER_COLUMNS = {
+    'staff_count': np.uint8,
+    'standard_distance': np.int16,
+    'year': np.int16
+}
+
+STRING_COLUMNS = ['txn_id']
+
+def category_dtype(column, values=None):
+    """某维度列的 CategoricalDtype；给出 values 时把未登记的取值追加到末尾"""
+    categories = list(CATEGORY_COLUMNS[column])
+    if values is not None:
+        known = set(categories)
+        categories.extend(v for v in pd.unique(pd.Series(values).dropna()) if v not in known)
+    return pd.CategoricalDtype(categories)
+
+def transaction_schema_dtypes(df):
+    """按 df 现有列给出目标 dtype 映射（不存在的列自动跳过）"""
+    dtypes = {}
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            dtypes[col] = category_dtype(col, df[col])
+    for col in FLOAT32_COLUMNS:
+        if col in df.columns:
+            dtypes[col] = np.float32
+    for col in FLOAT64_COLUMNS:
+        if col in df.columns:
+            dtypes[col] = np.float64
+    for col in BOOL_COLUMNS:
+        if col in df.columns:
+            dtypes[col] = bool
+    for col, dtype in INTEGER_COLUMNS.items():
+        if col in df.columns:
+            dtypes[col] = dtype
+    for col in STRING_COLUMNS:
+        if col in df.columns:
+            dtypes[col] = STRING_DTYPE
+    return dtypes
+
+def apply_transaction_schema(df):
+    """将交易明细表转换为紧凑内存模式，返回新的 DataFrame"""
+    return df.astype(transaction_schema_dtypes(df))